@@ -1,4 +1,6 @@
+import asyncio
 from .base import BaseAgent
+from ..services.context_builder import build_context
 from typing import Dict, Any
 
 class ReasoningAgent(BaseAgent):
@@ -6,11 +8,14 @@ class ReasoningAgent(BaseAgent):
         super().__init__(name="Reasoning", tools=[], llm=llm)
 
     async def generate_answer(self, user_query: str, context: list) -> Dict[str, Any]:
-        """Synthesize answer from context."""
+        """Synthesize answer from context (search matches and GitHub notes)."""
+        # Reads source files to merge chunks: keep it off the event loop
+        context_text = await asyncio.to_thread(build_context, context)
         
         prompt = f"""
         Question: {user_query}
-        Context: {context}
+        Context:
+{context_text}
         
         Answer based on the context provided.
         When mentioning GitHub issues, you MUST provide a markdown link to the issue using its url from the context (e.g., [Issue #123](https://github.com/...)).
@@ -11,14 +11,23 @@ class RetrievalAgent(BaseAgent):
         # In a real agent, the LLM would decide which tool to call.
         # Here we enforce vector search for the demo.
         
+        multi_tool = next((t for t in self.tools if t.name == "multi_vector_search"), None)
         search_tool = next((t for t in self.tools if t.name == "vector_search"), None)
         
-        if search_tool:
+        # Full chunk texts: the reasoner's context builder dedupes, merges and budgets them
+        if multi_tool and len(queries) > 1:
+            # Embed all queries in one batch, search concurrently, fuse the rankings
+            try:
+                result = await multi_tool.ainvoke({"queries": queries, "repo_id": repo_id, "truncate": False})
+                context.extend(result)
+            except Exception as e:
+                context.append(f"Error searching for {queries}: {e}")
+        elif search_tool:
             for query in queries:
                 try:
                     # Invoke the tool with repo_id
-                    result = search_tool.invoke({"query": query, "repo_id": repo_id})
-                    context.append(str(result))
+                    result = await search_tool.ainvoke({"query": query, "repo_id": repo_id, "truncate": False})
+                    context.extend(result)
                 except Exception as e:
                     context.append(f"Error searching for {query}: {e}")
         else:
@@ -6,6 +6,10 @@ class SafetyAgent(BaseAgent):
 
     async def check_response(self, content: str) -> dict:
         """Validate response for safety and accuracy."""
-        prompt = f"Review this answer: {content}\nIs it safe and grounded in code? If not, flag it."
+        prompt = (
+            f"Review this answer: {content}\n"
+            "Is it safe and grounded in code? Reply with SAFE or FLAGGED on the "
+            "first line, followed by a short reason."
+        )
         result = await self.ainvoke(prompt)
         return {"review": result["content"]}
@@ -6,55 +6,15 @@ import os
 import json
 from datetime import datetime
 from ..graph import app_graph
-from ..services.ingestion import IngestionService
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from pinecone import Pinecone
 from ..core.config import settings
 from ..core.database import SessionLocal
+from ..core.repo_registry import get_repo_registry
 from ..models.repository import Repository as RepositoryModel
 
 router = APIRouter()
 
-# File-based storage for repository status
-REPOS_FILE = os.path.join(os.getcwd(), "repositories.json")
-
-def load_repos():
-    if os.path.exists(REPOS_FILE):
-        try:
-            with open(REPOS_FILE, "r") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
-
-repositories_db: Dict[str, Dict[str, Any]] = load_repos()
-
-def save_repos():
-    try:
-        with open(REPOS_FILE, "w") as f:
-            json.dump(repositories_db, f, indent=4)
-    except Exception as e:
-        print(f"Error saving repos: {e}")
-
-# Shared embeddings and Pinecone client
-embeddings = None
-pc = None
-index = None
-
-def get_embeddings():
-    """Lazy load embeddings model"""
-    global embeddings
-    if embeddings is None:
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    return embeddings
-
-def get_pinecone_index():
-    """Lazy load Pinecone index"""
-    global pc, index
-    if pc is None:
-        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        index = pc.Index(settings.PINECONE_INDEX)
-    return index
+# Repository status lives in the shared SQLite registry
+registry = get_repo_registry()
 
 # Request/Response Models
 class ChatRequest(BaseModel):
@@ -118,7 +78,7 @@ async def get_repositories():
     """
     Get list of all repositories
     """
-    return list(repositories_db.values())
+    return registry.all()
 
 @router.post("/api/ingest", response_model=IngestResponse)
 async def ingest_repository(request: IngestRequest, background_tasks: BackgroundTasks):
@@ -128,10 +88,10 @@ async def ingest_repository(request: IngestRequest, background_tasks: Background
     try:
         # Extract repo name from URL
         repo_name = request.repo_url.rstrip("/").split("/")[-1].replace(".git", "")
-        repo_id = f"repo_{len(repositories_db) + 1}"
+        repo_id = f"repo_{len(registry) + 1}"
         
         # Create repository entry
-        repositories_db[repo_id] = {
+        registry.put({
             "id": repo_id,
             "name": repo_name,
             "url": request.repo_url,
@@ -140,8 +100,7 @@ async def ingest_repository(request: IngestRequest, background_tasks: Background
             "branch": "main",
             "language": "Python",
             "progress": 0
-        }
-        save_repos()
+        })
         
         # Start ingestion in background
         background_tasks.add_task(ingest_repo_background, repo_id, request.repo_url)
@@ -161,10 +120,12 @@ async def ingest_repo_background(repo_id: str, repo_url: str):
     try:
         from git import Repo
         import shutil
-        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from ..services import ingestion
+        from ..services.incremental import list_source_files
+        from ..services.vector_store import get_vector_store
         
         # Update progress
-        repositories_db[repo_id]["progress"] = 10
+        registry.update(repo_id, progress=10)
         
         # Extract repo name
         repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
@@ -172,7 +133,7 @@ async def ingest_repo_background(repo_id: str, repo_url: str):
         repo_dir = os.path.join(base_dir, repo_name)
         
         # Clone repository
-        repositories_db[repo_id]["progress"] = 20
+        registry.update(repo_id, progress=20)
         if os.path.exists(repo_dir):
             try:
                 repo = Repo(repo_dir)
@@ -184,74 +145,30 @@ async def ingest_repo_background(repo_id: str, repo_url: str):
             os.makedirs(base_dir, exist_ok=True)
             Repo.clone_from(repo_url, repo_dir)
         
-        repositories_db[repo_id]["progress"] = 40
-        
-        # Read files
-        documents = []
-        for root, _, files in os.walk(repo_dir):
-            if ".git" in root:
-                continue
-            for file in files:
-                if file.endswith(('.py', '.js', '.ts', '.jsx', '.tsx', '.md', '.txt', '.java', '.go', '.rs', '.c', '.cpp', '.h')):
-                    path = os.path.join(root, file)
-                    try:
-                        with open(path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                            documents.append({"text": content, "source": path, "repo": repo_name})
-                    except:
-                        pass
-        
-        repositories_db[repo_id]["progress"] = 60
-        
-        # Chunk documents
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks_text = []
-        chunks_meta = []
-        
-        for d in documents:
-            splits = splitter.split_text(d["text"])
-            for i, s in enumerate(splits):
-                chunk_id = f"{repo_name}-{os.path.basename(d['source'])}-{i}"
-                chunks_text.append(s)
-                chunks_meta.append({"text": s, "source": d["source"], "repo": d["repo"], "chunk_id": chunk_id})
-        
-        repositories_db[repo_id]["progress"] = 70
-        
-        if not chunks_text:
-            repositories_db[repo_id]["status"] = "Error"
-            repositories_db[repo_id]["lastSynced"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            save_repos()
+        registry.update(repo_id, progress=40)
+
+        files = list_source_files(repo_dir)
+        if not files:
+            registry.update(repo_id, status="Error", lastSynced=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
             return
-        
-        # Generate embeddings
-        emb = get_embeddings()
-        vectors = emb.embed_documents(chunks_text)
-        
-        repositories_db[repo_id]["progress"] = 85
-        
-        # Upsert to Pinecone
-        idx = get_pinecone_index()
-        batch_size = 100
-        for i in range(0, len(chunks_text), batch_size):
-            batch_vecs = vectors[i:i+batch_size]
-            batch_meta = chunks_meta[i:i+batch_size]
-            
-            to_upsert = []
-            for j, vec in enumerate(batch_vecs):
-                meta = batch_meta[j]
-                to_upsert.append({
-                    "id": meta["chunk_id"],
-                    "values": vec,
-                    "metadata": {"text": meta["text"], "source": meta["source"], "repo": meta["repo"]}
-                })
-            
-            idx.upsert(vectors=to_upsert)
-        
+
+        store = get_vector_store()
+        store.ensure_index(dimension=384)  # all-MiniLM-L6-v2 dimension
+        registry.update(repo_id, progress=50)
+
+        # Read → split → embed (through the embedding cache) → upsert, in batches
+        await asyncio.to_thread(
+            ingestion.run_pipeline,
+            repo_dir, files, repo_name,
+            upsert=lambda vectors: store.upsert(vectors, namespace=repo_id),
+            on_progress=lambda stats: registry.update(
+                repo_id, progress=50 + stats["files"] * 45 // max(stats["total_files"], 1)
+            ),
+        )
+        store.flush(repo_id)
+
         # Update status to completed
-        repositories_db[repo_id]["status"] = "Indexed"
-        repositories_db[repo_id]["progress"] = 100
-        repositories_db[repo_id]["lastSynced"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        save_repos()
+        registry.update(repo_id, status="Indexed", progress=100, lastSynced=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         
         # ALSO update the SQL database if the repo exists there
         db = SessionLocal()
@@ -273,20 +190,16 @@ async def ingest_repo_background(repo_id: str, repo_url: str):
         
     except Exception as e:
         print(f"Error ingesting repository: {e}")
-        repositories_db[repo_id]["status"] = "Error"
-        repositories_db[repo_id]["lastSynced"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        save_repos()
+        registry.update(repo_id, status="Error", lastSynced=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
 @router.delete("/api/repos/{repo_id}")
 async def delete_repository(repo_id: str):
     """
     Delete a repository
     """
-    if repo_id not in repositories_db:
+    if not registry.delete(repo_id):
         raise HTTPException(status_code=404, detail="Repository not found")
-    
-    del repositories_db[repo_id]
-    save_repos()
+
     return {"status": "success", "message": "Repository deleted"}
 
 @router.get("/api/health")
@@ -296,6 +209,6 @@ async def health_check():
     """
     return {
         "status": "ok",
-        "repositories": len(repositories_db),
-        "pinecone_connected": pc is not None
+        "repositories": len(registry),
+        "vector_store": settings.VECTOR_STORE
     }
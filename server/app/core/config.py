@@ -10,6 +10,35 @@ class Settings(BaseSettings):
     GITHUB_TOKEN: Optional[str] = None
     GITHUB_ACCESS_TOKEN: Optional[str] = None
     DATABASE_URL: Optional[str] = None
+    REPO_REGISTRY_PATH: str = "repositories.sqlite3"  # Repository status registry (replaces repositories.json)
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_WORKERS: int = 1  # Embedding processes for ingestion, 0 = one per CPU core
+    EMBEDDING_BATCH_SIZE: int = 100
+    INGEST_WORKERS: int = 1  # Ingest worker processes (separate from the API process)
+    INGEST_MAX_ATTEMPTS: int = 3  # Attempts per ingest job before it is marked failed
+    INGEST_QUEUE_PATH: str = "ingest_jobs.sqlite3"
+    CHUNK_MAX_CHARS: int = 1500  # Chunks are cut on function/class boundaries up to this size
+    QUERY_CACHE_SIZE: int = 2048
+    QUERY_CACHE_PATH: Optional[str] = None  # e.g. "query_cache.json" to persist across restarts
+    EMBEDDING_CACHE_PATH: str = "embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_MB: int = 1024  # 0 disables the chunk embedding cache
+    VECTOR_STORE: str = "pinecone"  # "pinecone" or "local"
+    LOCAL_INDEX_DIR: str = "vector_index"
+    LOCAL_INDEX_IVF_THRESHOLD: int = 50000  # Vectors per namespace before IVF search, 0 = always exact
+    LOCAL_INDEX_NPROBE: int = 8
+    RETRIEVAL_MODE: str = "hybrid"  # "hybrid" (vector + BM25) or "vector"
+    BM25_INDEX_DIR: str = "bm25_index"
+    NAMESPACE_SYNC_INTERVAL: int = 60  # Seconds between registry/vector store reconciliations, 0 disables
+    CONTEXT_TOKEN_BUDGET: int = 4000  # Max tokens of retrieved context in the answer prompt, 0 = no limit
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 50  # Chunks fetched for the cross-encoder to choose from
+    RERANK_BATCH_SIZE: int = 32
+    RERANK_TOKEN_BUDGET: int = 3000  # Max tokens of reranked chunks returned per search, 0 = no limit
+    PLANNER_MODE: str = "auto"  # "auto" (planner only for multi-step questions), "always" or "never"
+    ANSWER_CACHE_SIZE: int = 256  # Cached answers per repository, 0 disables the answer cache
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # Cosine similarity for two questions to share an answer
+    SAFETY_MODE: str = "async"  # "async" (review in background), "sync" or "off"
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,244 @@
+"""
+Repository registry.
+
+The status of every repository (name, URL, indexing progress, last indexed
+commit, ...) lives in a SQLite file in WAL mode instead of
+`repositories.json`. Each record is a JSON document in its own row, so a
+progress update during an ingest rewrites one row in one transaction rather
+than the whole file, readers never see a half-written record, and several
+threads or processes can update different repositories at the same time.
+
+Reads are served from an in-memory copy of the table. It is updated by this
+process's own writes and reloaded only when `PRAGMA data_version` shows a
+commit from another connection (e.g. an ingest worker process), so polling
+the repository list does not touch the file.
+
+Lookups by slug, normalized clone URL and SQL repository UUID are indexed.
+Callbacks registered with `on_change` run after every write that adds or
+removes a repository or changes its URL or UUID (not on progress updates).
+An existing `repositories.json` is imported the first time the registry is
+opened.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import settings
+
+LEGACY_REPOS_FILE = os.path.join(os.getcwd(), "repositories.json")
+
+
+def normalize_url(url: str) -> str:
+    """Comparable form of a clone URL: no scheme case, trailing slash or `.git`."""
+    url = (url or "").strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-4]
+    return url.lower()
+
+
+class RepoRegistry:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(os.getcwd(), settings.REPO_REGISTRY_PATH)
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+        self._rows: Optional[Dict[str, Dict[str, Any]]] = None  # In-memory copy, slug -> record
+        self._data_version = None
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS repositories (
+                id TEXT PRIMARY KEY,
+                url_key TEXT NOT NULL,
+                uuid TEXT,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_repositories_url_key ON repositories (url_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_repositories_uuid ON repositories (uuid)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._import_legacy()
+
+    def _import_legacy(self):
+        """Copy repositories.json into the registry once."""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                return
+            repos = {}
+            if os.path.exists(LEGACY_REPOS_FILE):
+                try:
+                    with open(LEGACY_REPOS_FILE, "r") as f:
+                        repos = json.load(f)
+                except Exception as e:
+                    print(f"Warning: Could not import {LEGACY_REPOS_FILE}: {e}")
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for rid, repo in repos.items():
+                    self._write(rid, {**repo, "id": rid}, replace=False)
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('legacy_imported', ?)", (str(time.time()),))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if repos:
+            print(f"Imported {len(repos)} repositories from {LEGACY_REPOS_FILE} into {self.path}")
+
+    def on_change(self, callback: Callable[[], None]):
+        """Call `callback` after every write that changes which repositories exist or their URL/UUID."""
+        self._listeners.append(callback)
+
+    def _changed(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Registry listener failed: {e}")
+
+    def _write(self, repo_id: str, repo: Dict[str, Any], replace: bool = True) -> bool:
+        # An upsert, not INSERT OR REPLACE, so a record keeps its rowid (list position)
+        conflict = (
+            "DO UPDATE SET url_key = excluded.url_key, uuid = excluded.uuid, "
+            "data = excluded.data, updated_at = excluded.updated_at"
+        ) if replace else "DO NOTHING"
+        written = self._conn.execute(
+            "INSERT INTO repositories (id, url_key, uuid, data, updated_at) VALUES (?, ?, ?, ?, ?) "
+            f"ON CONFLICT (id) {conflict}",
+            (repo_id, normalize_url(repo.get("url", "")), repo.get("uuid"), json.dumps(repo), time.time()),
+        ).rowcount > 0
+        if written and self._rows is not None:
+            self._rows[repo_id] = dict(repo)
+        return written
+
+    def _read(self, repo_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT data FROM repositories WHERE id = ?", (repo_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """The in-memory copy, reloaded if another connection has committed since it was read."""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._rows is None or version != self._data_version:
+            rows = self._conn.execute("SELECT id, data FROM repositories ORDER BY rowid").fetchall()
+            self._rows = {rid: json.loads(data) for rid, data in rows}
+            self._data_version = version
+        return self._rows
+
+    # ---- Reads ----
+
+    def get(self, repo_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            repo = self._snapshot().get(repo_id)
+            return dict(repo) if repo is not None else None
+
+    def __contains__(self, repo_id: str) -> bool:
+        with self._lock:
+            return repo_id in self._snapshot()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._snapshot())
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Every repository, in the order they were first added."""
+        with self._lock:
+            return [dict(repo) for repo in self._snapshot().values()]
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._snapshot())
+
+    def find_by_url(self, url: str) -> Optional[str]:
+        """Slug of the repository cloned from `url` (with or without `.git`)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM repositories WHERE url_key = ? ORDER BY rowid LIMIT 1", (normalize_url(url),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def find_by_uuid(self, uuid: str) -> Optional[str]:
+        """Slug of the repository linked to a SQL repository UUID."""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM repositories WHERE uuid = ? LIMIT 1", (uuid,)).fetchone()
+        return row[0] if row else None
+
+    def identities(self) -> List[tuple]:
+        """(slug, normalized URL, UUID) of every repository, for building lookup maps."""
+        with self._lock:
+            return self._conn.execute("SELECT id, url_key, uuid FROM repositories ORDER BY rowid").fetchall()
+
+    # ---- Writes (each one is a single transaction) ----
+
+    def put(self, repo: Dict[str, Any]):
+        """Insert or replace a whole record; `repo["id"]` is its slug."""
+        with self._lock:
+            self._write(repo["id"], repo)
+        self._changed()
+
+    def add(self, repo: Dict[str, Any]) -> bool:
+        """Insert a record unless its slug is already taken. Returns True when inserted."""
+        with self._lock:
+            added = self._write(repo["id"], repo, replace=False)
+        if added:
+            self._changed()
+        return added
+
+    def update(self, repo_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """
+        Atomically merge `fields` into a record and return the updated record,
+        or None when the repository does not exist.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                repo = self._read(repo_id)
+                if repo is not None:
+                    repo.update(fields)
+                    self._write(repo_id, repo)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                self._rows = None
+                raise
+        if repo is not None and ("url" in fields or "uuid" in fields):
+            self._changed()
+        return dict(repo) if repo is not None else None
+
+    def link_uuid(self, repo_id: str, uuid: str):
+        """Remember the SQL repository UUID of a slug for indexed lookups."""
+        self.update(repo_id, uuid=uuid)
+
+    def delete(self, repo_id: str) -> bool:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM repositories WHERE id = ?", (repo_id,)).rowcount > 0
+            if self._rows is not None:
+                self._rows.pop(repo_id, None)
+        if deleted:
+            self._changed()
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM repositories")
+            if self._rows is not None:
+                self._rows.clear()
+        self._changed()
+
+
+_registry: Optional[RepoRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_repo_registry() -> RepoRegistry:
+    """Process-wide registry, opened on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = RepoRegistry()
+    return _registry
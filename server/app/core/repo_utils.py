@@ -1,56 +1,129 @@
-from typing import Dict, Any
-from .database import SessionLocal
-from ..models.repository import Repository as RepositoryModel
-import json
-import os
+"""
+Repository identifier resolution.
+
+Requests name a repository by its slug, its clone URL or the UUID of its row
+in the SQL database. `RepoResolver` keeps slug, normalized-URL and UUID maps
+in memory, built from the repository registry on first use and dropped
+whenever the registry adds or removes a repository or changes its URL/UUID,
+so resolving an identifier is a dict lookup. Only a UUID that has never been
+seen is looked up in SQL; the match is linked in the registry. A UUID with no
+match is not looked up again for UNKNOWN_TTL seconds, so a repository created
+in SQL later is still found.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .repo_registry import RepoRegistry, get_repo_registry, normalize_url
+
+UNKNOWN_TTL = 60
 
-REPOS_FILE = os.path.join(os.getcwd(), "repositories.json")
 
 def load_repos_json() -> Dict[str, Dict[str, Any]]:
-    if os.path.exists(REPOS_FILE):
-        try:
-            with open(REPOS_FILE, "r") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+    """Snapshot of the repository registry keyed by slug."""
+    return {repo["id"]: repo for repo in get_repo_registry().all()}
 
-def resolve_repo_id(repo_id: str) -> str:
-    """
-    Resolves a repository identifier (slug, UUID, or URL) 
-    to its standard slug in repositories.json.
-    """
-    if not repo_id:
-        return repo_id
 
-    repos_db = load_repos_json()
+class RepoResolver:
+    def __init__(self, registry: RepoRegistry):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._maps = None  # (slugs, url -> slug, uuid -> slug), None until built
+        self._unknown: Dict[str, float] = {}  # UUID with no matching repository -> when to retry
+        registry.on_change(self.invalidate)
 
-    # 1. Direct slug match
-    if repo_id in repos_db:
-        return repo_id
+    def invalidate(self):
+        with self._lock:
+            self._maps = None
+            self._unknown.clear()
+
+    def _load(self):
+        maps = self._maps
+        if maps is None:
+            with self._lock:
+                if self._maps is None:
+                    slugs, urls, uuids = set(), {}, {}
+                    for rid, url_key, uuid in self.registry.identities():
+                        slugs.add(rid)
+                        if url_key:
+                            urls.setdefault(url_key, rid)
+                        if uuid:
+                            uuids[uuid] = rid
+                    self._maps = (slugs, urls, uuids)
+                maps = self._maps
+        return maps
+
+    def resolve(self, repo_id: str) -> str:
+        """Slug for a slug, clone URL or SQL UUID; unknown identifiers are returned unchanged."""
+        if not repo_id:
+            return repo_id
+
+        slugs, urls, uuids = self._load()
 
-    # 2. Check for URL match
-    for rid, data in repos_db.items():
-        if data.get("url") == repo_id or data.get("url") == repo_id + ".git":
+        # 1. Direct slug match
+        if repo_id in slugs:
+            return repo_id
+
+        # 2. Check for URL match
+        rid = urls.get(normalize_url(repo_id))
+        if rid:
             return rid
 
-    # 3. Resolve via DB if it looks like a UUID
-    if len(repo_id) >= 32:
-        db = SessionLocal()
+        # 3. UUID from the SQL database
+        if len(repo_id) >= 32:
+            rid = uuids.get(repo_id)
+            if rid:
+                return rid
+            if self._unknown.get(repo_id, 0) <= time.monotonic():
+                rid = self._lookup_uuid(repo_id, urls)
+                if rid:
+                    # Linking the UUID invalidates the maps; they pick it up on rebuild
+                    self.registry.link_uuid(rid, repo_id)
+                    return rid
+                with self._lock:
+                    self._unknown[repo_id] = time.monotonic() + UNKNOWN_TTL
+
+        return repo_id
+
+    @staticmethod
+    def _lookup_uuid(repo_id: str, urls: Dict[str, str]) -> Optional[str]:
         try:
-            sql_repo = (
-                db.query(RepositoryModel)
-                .filter(RepositoryModel.id == repo_id)
-                .first()
-            )
-            if sql_repo and sql_repo.html_url:
-                url = sql_repo.html_url
-                for rid, data in repos_db.items():
-                    if data.get("url") == url or data.get("url") == url + ".git":
-                        return rid
+            from .database import SessionLocal
+            from ..models.repository import Repository as RepositoryModel
+
+            db = SessionLocal()
+            try:
+                sql_repo = (
+                    db.query(RepositoryModel)
+                    .filter(RepositoryModel.id == repo_id)
+                    .first()
+                )
+                if sql_repo and sql_repo.html_url:
+                    return urls.get(normalize_url(sql_repo.html_url))
+            finally:
+                db.close()
         except Exception:
             pass
-        finally:
-            db.close()
+        return None
+
+
+_resolver: Optional[RepoResolver] = None
+_resolver_lock = threading.Lock()
 
-    return repo_id
+
+def get_repo_resolver() -> RepoResolver:
+    """Process-wide resolver over the process-wide registry."""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = RepoResolver(get_repo_registry())
+    return _resolver
+
+
+def resolve_repo_id(repo_id: str) -> str:
+    """
+    Resolves a repository identifier (slug, UUID, or URL)
+    to its standard slug in the repository registry.
+    """
+    return get_repo_resolver().resolve(repo_id)
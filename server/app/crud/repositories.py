@@ -106,3 +106,65 @@ def add_indexed_file(
 def get_repository_indexed_files(db: Session, repo_id: UUID) -> list[IndexedFile]:
     """Get all indexed files for a repository"""
     return db.query(IndexedFile).filter(IndexedFile.repository_id == repo_id).all()
+
+
+def get_repository_by_url(db: Session, html_url: str) -> Repository | None:
+    """Get repository by its GitHub URL (with or without a trailing .git)"""
+    url = html_url.rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-4]
+    return (
+        db.query(Repository)
+        .filter((Repository.html_url == url) | (Repository.html_url == url + ".git"))
+        .first()
+    )
+
+
+def get_indexed_file_hashes(db: Session, repo_id: UUID) -> dict[str, str]:
+    """Get a file_path -> content_hash map of a repository's indexed files"""
+    rows = (
+        db.query(IndexedFile.file_path, IndexedFile.content_hash)
+        .filter(IndexedFile.repository_id == repo_id)
+        .all()
+    )
+    return {path: content_hash for path, content_hash in rows if content_hash}
+
+
+def sync_indexed_files(
+    db: Session,
+    repo_id: UUID,
+    hashes: dict[str, str],
+    removed: list[str] | None = None,
+    replace_all: bool = False,
+) -> None:
+    """
+    Record the content hashes of freshly embedded files.
+    Existing rows are updated in place, `removed` rows are dropped, and with
+    `replace_all` every row not present in `hashes` is dropped as well.
+    """
+    existing = {
+        f.file_path: f
+        for f in db.query(IndexedFile).filter(IndexedFile.repository_id == repo_id).all()
+    }
+
+    for path, content_hash in hashes.items():
+        db_file = existing.get(path)
+        if db_file:
+            db_file.content_hash = content_hash
+            db_file.embeddings_stored = True
+        else:
+            db.add(IndexedFile(
+                repository_id=repo_id,
+                file_path=path,
+                content_hash=content_hash,
+                embeddings_stored=True,
+            ))
+
+    stale = set(removed or [])
+    if replace_all:
+        stale |= set(existing) - set(hashes)
+    for path in stale:
+        if path in existing:
+            db.delete(existing[path])
+
+    db.commit()
@@ -1,3 +1,4 @@
+import uuid
 from langgraph.graph import StateGraph, START, END
 from typing import Dict, Any
 
@@ -5,6 +6,8 @@ from .state import AgentState
 from .agents import PlannerAgent, RetrievalAgent, ReasoningAgent, GitHubAgent, SafetyAgent
 from .services.llm import get_llm
 from .services.tools import get_all_tools
+from .services.safety import review_answer
+from .services.query_router import expand_query, needs_plan, plan_steps
 
 llm = get_llm()
 tools = get_all_tools()
@@ -17,15 +20,20 @@ safety = SafetyAgent(llm)
 
 # Define nodes
 
+def route_query(state: AgentState):
+    """Only multi-step questions go through the planner first."""
+    return "planner" if needs_plan(state["input"]) else "retriever"
+
 async def planning_node(state: AgentState):
     plan = await planner.plan_task(state["input"])
-    return {"plan": plan["plan"]}
+    return {"plan": plan_steps(plan["plan"])}
 
 async def retrieval_node(state: AgentState):
-    # Depending on plan, decide what to look up
-    # This is a simplification
+    # Search for the question plus every planned step, or its local expansion
     repo_id = state.get("repo_id")  # Get repo_id from state
-    context = await retriever.retrieve_context([state["input"]], repo_id=repo_id)
+    plan = list(state.get("plan") or [])
+    queries = [state["input"]] + plan if plan else expand_query(state["input"])
+    context = await retriever.retrieve_context(queries, repo_id=repo_id)
     return {"context": context["context"]}
 
 async def github_node(state: AgentState):
@@ -43,7 +51,7 @@ async def github_node(state: AgentState):
             search_tool = next((t for t in tools if t.name == "search_github_issues"), None)
             if search_tool:
                 try:
-                    issues = search_tool.invoke({"repo_url": repo_url})
+                    issues = await search_tool.ainvoke({"repo_url": repo_url})
                     if issues and not any("error" in str(i) for i in issues):
                         # Format issues as readable context for the LLM
                         formatted = []
@@ -67,9 +75,17 @@ async def reasoning_node(state: AgentState):
     return {"answer": answer["answer"]}
 
 async def safety_node(state: AgentState):
-    review = await safety.check_response(state["answer"])
-    # If bad, modify or flag. For now assume good.
-    return {"final_output": {"answer": state["answer"], "confidence": "high", "sources": []}}
+    # Local pre-check now; the LLM review runs in the background unless
+    # SAFETY_MODE is "sync", and its verdict is fetched by answer id
+    answer_id = uuid.uuid4().hex
+    review = await review_answer(answer_id, state["answer"], safety)
+    return {"final_output": {
+        "answer": state["answer"],
+        "answer_id": answer_id,
+        "confidence": "low" if review["status"] == "flagged" else "high",
+        "sources": [],
+        "safety": review,
+    }}
 
 # Build graph
 workflow = StateGraph(AgentState)
@@ -80,11 +96,67 @@ workflow.add_node("github", github_node)
 workflow.add_node("reasoner", reasoning_node)
 workflow.add_node("safety", safety_node)
 
-workflow.add_edge(START, "planner")
+# Retrieval and github are independent: fan out from START so they run
+# concurrently, and join before the reasoner. The planner (an extra LLM call)
+# only runs ahead of retrieval for questions the router deems multi-step.
+workflow.add_conditional_edges(START, route_query, ["planner", "retriever"])
+workflow.add_edge(START, "github")
 workflow.add_edge("planner", "retriever")
-workflow.add_edge("retriever", "github")
-workflow.add_edge("github", "reasoner") 
+workflow.add_edge(["retriever", "github"], "reasoner")
 workflow.add_edge("reasoner", "safety")
 workflow.add_edge("safety", END)
 
 app_graph = workflow.compile()
+
+NODES = ("planner", "retriever", "github", "reasoner", "safety")
+
+
+def _chunk_text(chunk) -> str:
+    """Text of a streamed chat model (AIMessageChunk) or LLM (GenerationChunk) chunk."""
+    if isinstance(chunk, str):
+        return chunk
+    content = getattr(chunk, "content", None)
+    if isinstance(content, str):
+        return content
+    text = getattr(chunk, "text", "")
+    return text if isinstance(text, str) else ""
+
+
+async def stream_graph(initial_state: Dict[str, Any]):
+    """
+    Run the graph and yield events as they happen:
+
+    - {"type": "node", "node": name, "status": "start" | "end"}
+    - {"type": "token", "text": str} for the reasoner's answer, as the LLM
+      produces it (in one piece if the LLM cannot stream)
+    - {"type": "final", "output": final_output} once the graph is done
+    """
+    final_output: Dict[str, Any] = {}
+    streamed = False
+
+    async for event in app_graph.astream_events(initial_state, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind in ("on_chat_model_stream", "on_llm_stream") and node == "reasoner":
+            text = _chunk_text(event["data"].get("chunk"))
+            if text:
+                streamed = True
+                yield {"type": "token", "text": text}
+            continue
+
+        if kind not in ("on_chain_start", "on_chain_end") or event.get("name") != node or node not in NODES:
+            continue
+
+        if kind == "on_chain_start":
+            yield {"type": "node", "node": node, "status": "start"}
+            continue
+
+        output = event["data"].get("output") or {}
+        if node == "reasoner" and not streamed and output.get("answer"):
+            yield {"type": "token", "text": output["answer"]}
+        elif node == "safety":
+            final_output = output.get("final_output", {})
+        yield {"type": "node", "node": node, "status": "end"}
+
+    yield {"type": "final", "output": final_output}
@@ -1,9 +1,14 @@
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings
 from .core.database import init_db
 from .mcp_server import mcp
+from .services.embeddings import warm_up as warm_up_embeddings, shutdown as shutdown_embeddings
+from .services.namespace_sync import get_namespace_sync
+from .services.ingest_queue import get_worker_pool
+from .services.vector_store import aclose_vector_store
 
 # ─── Import ALL models BEFORE init_db so SQLAlchemy metadata is populated ───
 from .models.user import User, Account, Session, VerificationToken
@@ -23,12 +28,23 @@ async def lifespan(app: FastAPI):
     # Startup — models are imported, metadata is ready
     init_db()
     print("Database initialized with Neon PostgreSQL")
+    try:
+        await asyncio.to_thread(warm_up_embeddings)
+        print("Embedding model loaded")
+    except Exception as e:
+        print(f"Warning: Could not load embedding model: {e}")
+    get_namespace_sync().start()
+    get_worker_pool().ensure_running()
     if hasattr(mcp_app, 'lifespan'):
         async with mcp_app.lifespan(app):
             yield
     else:
         yield
     # Shutdown
+    get_namespace_sync().stop()
+    get_worker_pool().stop()
+    shutdown_embeddings()
+    await aclose_vector_store()
     print("Shutting down Akaza Backend")
 
 app = FastAPI(
@@ -83,12 +99,16 @@ async def root():
         "mcp_endpoint": "/mcp",
         "mcp_tools": [
             "query_codebase",
+            "query_codebase_stream",
+            "get_safety_review",
             "search_code_vectors",
             "search_code_files",
             "read_file",
             "get_github_issues",
             "list_repositories",
             "ingest_repository",
+            "ingest_repository_stream",
+            "get_ingest_job",
             "delete_repository",
             "clear_all_repositories",
             "get_settings",
@@ -10,23 +10,26 @@ The client calls MCP tools directly through the in-process FastMCP server,
 avoiding network overhead while keeping the MCP protocol as the contract.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator
 from .mcp_server import (
     mcp,
     query_codebase,
+    stream_query,
+    stream_ingest_progress,
+    get_safety_review,
     search_code_vectors,
     search_code_files,
     read_file,
     get_github_issues,
     list_repositories,
     ingest_repository,
+    get_ingest_job,
     delete_repository,
     clear_all_repositories,
     get_settings,
     update_settings,
-    repositories_db,
-    _save_repos,
 )
+from .core.repo_registry import RepoRegistry, get_repo_registry
 
 
 class MCPClient:
@@ -49,15 +52,23 @@ class MCPClient:
         """Call the query_codebase MCP tool."""
         return await query_codebase(query=query, repo_id=repo_id)
 
+    def chat_stream(self, query: str, repo_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Event stream of the query_codebase_stream MCP tool."""
+        return stream_query(query=query, repo_id=repo_id)
+
+    def safety_review(self, answer_id: str) -> Dict[str, Any]:
+        """Call the get_safety_review MCP tool."""
+        return get_safety_review(answer_id=answer_id)
+
     # ---- Code Search ----
 
     def vector_search(self, query: str, repo_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """Call the search_code_vectors MCP tool."""
         return search_code_vectors(query=query, repo_id=repo_id, top_k=top_k)
 
-    def grep_search(self, pattern: str, repo_id: str) -> List[str]:
+    def grep_search(self, pattern: str, repo_id: str, **options) -> Dict[str, Any]:
         """Call the search_code_files MCP tool."""
-        return search_code_files(pattern=pattern, repo_id=repo_id)
+        return search_code_files(pattern=pattern, repo_id=repo_id, **options)
 
     def read_repo_file(self, file_path: str) -> str:
         """Call the read_file MCP tool."""
@@ -75,9 +86,17 @@ class MCPClient:
         """Call the list_repositories MCP tool."""
         return list_repositories()
 
-    def start_ingest(self, repo_url: str) -> Dict[str, Any]:
+    def start_ingest(self, repo_url: str, incremental: bool = True) -> Dict[str, Any]:
         """Call the ingest_repository MCP tool."""
-        return ingest_repository(repo_url=repo_url)
+        return ingest_repository(repo_url=repo_url, incremental=incremental)
+
+    def ingest_job(self, job_id: str) -> Dict[str, Any]:
+        """Call the get_ingest_job MCP tool."""
+        return get_ingest_job(job_id=job_id)
+
+    def ingest_events(self, repo_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Progress events of a repository's ingest (as sent by ingest_repository_stream)."""
+        return stream_ingest_progress(repo_id)
 
     def remove_repo(self, repo_id: str) -> Dict[str, Any]:
         """Call the delete_repository MCP tool."""
@@ -100,11 +119,8 @@ class MCPClient:
     # ---- Direct access to shared state (for background tasks) ----
 
     @property
-    def repos_db(self) -> Dict[str, Dict[str, Any]]:
-        return repositories_db
-
-    def save_repos(self):
-        _save_repos(repositories_db)
+    def registry(self) -> RepoRegistry:
+        return get_repo_registry()
 
 
 # Singleton
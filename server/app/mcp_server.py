@@ -8,13 +8,17 @@ that call these MCP tools via the MCP client.
 MCP endpoint: http://localhost:8000/mcp
 """
 
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 from typing import Dict, Any, List, Optional
+import asyncio
 import os
 import json
 import re
 from datetime import datetime
 
+from .core.repo_registry import get_repo_registry
+from .core.repo_utils import resolve_repo_id
+
 # ---------------------------------------------------------------------------
 # MCP Server instance
 # ---------------------------------------------------------------------------
@@ -34,74 +38,12 @@ mcp = FastMCP(
 )
 
 # ---------------------------------------------------------------------------
-# Shared state — repositories database (file-backed)
+# Shared state — repository registry (SQLite-backed)
 # ---------------------------------------------------------------------------
 
-REPOS_FILE = os.path.join(os.getcwd(), "repositories.json")
-
-
-def _load_repos() -> Dict[str, Dict[str, Any]]:
-    if os.path.exists(REPOS_FILE):
-        try:
-            with open(REPOS_FILE, "r") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
-
-
-def _save_repos(db: dict):
-    try:
-        with open(REPOS_FILE, "w") as f:
-            json.dump(db, f, indent=4)
-    except Exception as e:
-        print(f"Error saving repos: {e}")
-
-
-repositories_db: Dict[str, Dict[str, Any]] = _load_repos()
 
-
-def _resolve_repo_id(repo_id: str) -> str:
-    """
-    Resolves a repo identifier to the slug used in repositories_db.
-    Handles UUIDs from the SQL database by looking up their URL.
-    """
-    if not repo_id:
-        return repo_id
-
-    # 1. Direct match
-    if repo_id in repositories_db:
-        return repo_id
-
-    # 2. Check for URL match
-    for rid, data in repositories_db.items():
-        if data.get("url") == repo_id or data.get("url") == repo_id + ".git":
-            return rid
-
-    # 3. Resolve via DB if it looks like a UUID
-    if len(repo_id) >= 32:
-        try:
-            from .core.database import SessionLocal
-            from .models.repository import Repository as RepositoryModel
-
-            db = SessionLocal()
-            try:
-                sql_repo = (
-                    db.query(RepositoryModel)
-                    .filter(RepositoryModel.id == repo_id)
-                    .first()
-                )
-                if sql_repo and sql_repo.html_url:
-                    url = sql_repo.html_url
-                    for rid, data in repositories_db.items():
-                        if data.get("url") == url or data.get("url") == url + ".git":
-                            return rid
-            finally:
-                db.close()
-        except Exception:
-            pass
-
-    return repo_id
+def _repo_commit(repo_id: str) -> str:
+    return (get_repo_registry().get(repo_id) or {}).get("commit", "")
 
 # ---------------------------------------------------------------------------
 # MCP Resources
@@ -111,14 +53,14 @@ def _resolve_repo_id(repo_id: str) -> str:
 @mcp.resource("repos://list")
 def resource_repos_list() -> str:
     """Returns the current list of indexed repositories as JSON."""
-    return json.dumps(list(repositories_db.values()), indent=2)
+    return json.dumps(get_repo_registry().all(), indent=2)
 
 
 @mcp.resource("repos://{repo_id}/status")
 def resource_repo_status(repo_id: str) -> str:
     """Returns the status of a specific repository."""
-    repo_id = _resolve_repo_id(repo_id)
-    repo = repositories_db.get(repo_id)
+    repo_id = resolve_repo_id(repo_id)
+    repo = get_repo_registry().get(repo_id)
     if not repo:
         return json.dumps({"error": "Repository not found"})
     return json.dumps(repo, indent=2)
@@ -129,53 +71,205 @@ def resource_repo_status(repo_id: str) -> str:
 # ---------------------------------------------------------------------------
 
 
+def _query_state(query: str, repo_id: str) -> Dict[str, Any]:
+    """Initial graph state for a question, or {"error": ...}."""
+    repo_id = resolve_repo_id(repo_id)
+
+    repo = get_repo_registry().get(repo_id)
+    if repo is None:
+        return {"error": f"Repository '{repo_id}' not found"}
+
+    if repo["status"] != "Indexed":
+        return {"error": f"Repository '{repo_id}' is not indexed yet"}
+
+    return {
+        "input": query,
+        "repo_id": repo_id,
+        "repo_url": repo.get("url", ""),
+        "context": [],
+        "github_data": [],
+        "messages": [],
+        "plan": [],
+        "answer": "",
+    }
+
+
+def _format_answer(final_output: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "answer": final_output.get("answer", "No answer generated"),
+        "confidence": final_output.get("confidence", "unknown"),
+        "sources": final_output.get("sources", []),
+        "answer_id": final_output.get("answer_id"),
+        "safety": final_output.get("safety"),
+    }
+
+
+async def _cached_answer(initial_state: Dict[str, Any]):
+    """
+    Look the question up in the semantic answer cache.
+    Returns (answer or None, query vector or None to skip caching).
+    """
+    from .services.answer_cache import get_answer_cache
+    from .services.embeddings import embed_query
+    from .services.safety import get_review
+
+    cache = get_answer_cache()
+    if cache is None:
+        return None, None
+
+    repo_id = initial_state["repo_id"]
+    try:
+        vector = await asyncio.to_thread(embed_query, initial_state["input"])
+    except Exception as e:
+        print(f"Answer cache lookup failed: {e}")
+        return None, None
+
+    hit = cache.get(repo_id, _repo_commit(repo_id), vector)
+    if hit is None:
+        return None, vector
+
+    answer = hit["answer"]
+    review = get_review(answer["answer_id"]) if answer.get("answer_id") else None
+    if review is not None:
+        if review["status"] == "flagged":
+            return None, None
+        answer["safety"] = review
+    answer["cached"] = True
+    return answer, None
+
+
+def _cache_answer(initial_state: Dict[str, Any], vector, answer: Dict[str, Any]):
+    from .services.answer_cache import get_answer_cache
+
+    cache = get_answer_cache()
+    safety = answer.get("safety") or {}
+    if cache is None or vector is None or safety.get("status") == "flagged":
+        return
+    repo_id = initial_state["repo_id"]
+    cache.put(repo_id, _repo_commit(repo_id), initial_state["input"], vector, answer)
+
+
 @mcp.tool
 async def query_codebase(query: str, repo_id: str) -> Dict[str, Any]:
     """
     Ask a natural-language question about an indexed codebase.
-    Uses the LangGraph agent pipeline (planner → retriever → github → reasoner → safety).
+    Uses the LangGraph agent pipeline ([planner →] retriever and github in
+    parallel → reasoner → safety); the planner only runs for multi-step questions.
 
     Args:
         query: The question to ask.
         repo_id: The repository ID to query against.
 
     Returns:
-        A dict with 'answer', 'confidence', and 'sources'.
+        A dict with 'answer', 'confidence', 'sources', 'answer_id' and the
+        'safety' review status (see `get_safety_review`). Answers served from
+        the semantic answer cache also have 'cached': true.
     """
-    repo_id = _resolve_repo_id(repo_id)
+    initial_state = _query_state(query, repo_id)
+    if "error" in initial_state:
+        return initial_state
 
-    if repo_id not in repositories_db:
-        return {"error": f"Repository '{repo_id}' not found"}
-
-    if repositories_db[repo_id]["status"] != "Indexed":
-        return {"error": f"Repository '{repo_id}' is not indexed yet"}
+    cached, vector = await _cached_answer(initial_state)
+    if cached is not None:
+        return cached
 
     try:
         from .graph import app_graph
 
-        repo_url = repositories_db[repo_id].get("url", "")
+        result = await app_graph.ainvoke(initial_state)
+        answer = _format_answer(result.get("final_output", {}))
+        _cache_answer(initial_state, vector, answer)
+        return answer
+    except Exception as e:
+        return {"error": f"Error processing query: {str(e)}"}
 
-        initial_state = {
-            "input": query,
-            "repo_id": repo_id,
-            "repo_url": repo_url,
-            "context": [],
-            "github_data": [],
-            "messages": [],
-            "plan": [],
-            "answer": "",
-        }
 
-        result = await app_graph.ainvoke(initial_state)
-        final_output = result.get("final_output", {})
+async def stream_query(query: str, repo_id: str):
+    """
+    Streaming variant of `query_codebase`, shared by the
+    `query_codebase_stream` tool and the /api/chat/stream route.
 
-        return {
-            "answer": final_output.get("answer", "No answer generated"),
-            "confidence": final_output.get("confidence", "unknown"),
-            "sources": final_output.get("sources", []),
-        }
+    Yields graph node events ({"type": "node", ...}), answer tokens
+    ({"type": "token", "text": ...}) and finally either
+    {"type": "final", "answer", "confidence", "sources"} or
+    {"type": "error", "error": ...}.
+    """
+    initial_state = _query_state(query, repo_id)
+    if "error" in initial_state:
+        yield {"type": "error", "error": initial_state["error"]}
+        return
+
+    cached, vector = await _cached_answer(initial_state)
+    if cached is not None:
+        yield {"type": "token", "text": cached["answer"]}
+        yield {"type": "final", **cached}
+        return
+
+    try:
+        from .graph import stream_graph
+
+        async for event in stream_graph(initial_state):
+            if event["type"] == "final":
+                answer = _format_answer(event["output"])
+                _cache_answer(initial_state, vector, answer)
+                yield {"type": "final", **answer}
+            else:
+                yield event
     except Exception as e:
-        return {"error": f"Error processing query: {str(e)}"}
+        yield {"type": "error", "error": f"Error processing query: {str(e)}"}
+
+
+@mcp.tool
+async def query_codebase_stream(query: str, repo_id: str, ctx: Context) -> Dict[str, Any]:
+    """
+    Same as `query_codebase`, but streams while the agents work: every graph
+    node start/end and every answer token is sent as a log notification
+    carrying a JSON event, and node completions are reported as progress.
+
+    Args:
+        query: The question to ask.
+        repo_id: The repository ID to query against.
+
+    Returns:
+        A dict with 'answer', 'confidence', and 'sources' once the answer is complete.
+    """
+    from .graph import NODES
+
+    done = 0
+    async for event in stream_query(query, repo_id):
+        if event["type"] == "error":
+            return {"error": event["error"]}
+        if event["type"] == "final":
+            await ctx.report_progress(progress=len(NODES), total=len(NODES))
+            return {k: v for k, v in event.items() if k != "type"}
+
+        await ctx.info(json.dumps(event))
+        if event["type"] == "node" and event["status"] == "end":
+            done += 1
+            await ctx.report_progress(progress=done, total=len(NODES))
+
+    return {"error": "No answer generated"}
+
+
+@mcp.tool
+def get_safety_review(answer_id: str) -> Dict[str, Any]:
+    """
+    Get the safety review of an answer returned by `query_codebase`.
+    Reviews run in the background, so the status may still be "pending".
+
+    Args:
+        answer_id: The 'answer_id' of the answer.
+
+    Returns:
+        A dict with 'status' (pending, safe, flagged, skipped or error),
+        'flags' from the local pre-check and the reviewer's 'review' text.
+    """
+    from .services.safety import get_review
+
+    review = get_review(answer_id)
+    if review is None:
+        return {"error": f"No safety review found for answer '{answer_id}'"}
+    return review
 
 
 # ---------------------------------------------------------------------------
@@ -186,7 +280,7 @@ async def query_codebase(query: str, repo_id: str) -> Dict[str, Any]:
 @mcp.tool
 def search_code_vectors(query: str, repo_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
     """
-    Search for relevant code chunks using Pinecone vector search.
+    Search for relevant code chunks using vector search.
 
     Args:
         query: The search query.
@@ -196,33 +290,24 @@ def search_code_vectors(query: str, repo_id: str, top_k: int = 5) -> List[Dict[s
     Returns:
         A list of matching code chunks with file paths and scores.
     """
-    repo_id = _resolve_repo_id(repo_id)
+    repo_id = resolve_repo_id(repo_id)
     try:
-        from pinecone import Pinecone
-        from langchain_community.embeddings import HuggingFaceEmbeddings
         from .core.config import settings
+        from .services.embeddings import embed_query
+        from .services.vector_store import get_vector_store
 
-        if not settings.PINECONE_API_KEY:
+        if settings.VECTOR_STORE != "local" and not settings.PINECONE_API_KEY:
             return [{"error": "Pinecone not configured"}]
 
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        index = pc.Index(settings.PINECONE_INDEX)
-
-        vector = embeddings.embed_query(query)
-        results = index.query(
-            vector=vector,
-            top_k=top_k,
-            include_metadata=True,
-            namespace=repo_id,
-        )
+        vector = embed_query(query)
+        results = get_vector_store().query(vector, top_k=top_k, namespace=repo_id)
 
         matches = []
-        for match in results.matches:
+        for match in results:
             matches.append({
-                "file": match.metadata.get("source", "unknown"),
-                "content": match.metadata.get("text", "")[:500],
-                "score": match.score,
+                "file": match["metadata"].get("source", "unknown"),
+                "content": match["metadata"].get("text", "")[:500],
+                "score": match["score"],
             })
         return matches
     except Exception as e:
@@ -230,43 +315,56 @@ def search_code_vectors(query: str, repo_id: str, top_k: int = 5) -> List[Dict[s
 
 
 @mcp.tool
-def search_code_files(pattern: str, repo_id: str) -> List[str]:
+def search_code_files(
+    pattern: str,
+    repo_id: str,
+    patterns: Optional[List[str]] = None,
+    regex: bool = False,
+    ignore_case: bool = False,
+    glob: Optional[List[str]] = None,
+    max_per_file: int = 20,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
     """
-    Grep-style search for an exact string pattern in repository files.
+    Grep-style search through repository files.
 
     Args:
-        pattern: The text pattern to search for.
+        pattern: The text (or regex) pattern to search for.
         repo_id: The repository to search in (used to resolve directory).
+        patterns: Additional patterns; a line matches if any pattern matches.
+        regex: Treat the patterns as regular expressions.
+        ignore_case: Match case-insensitively.
+        glob: Only search files matching one of these globs (e.g. ["*.py", "src/**"]).
+        max_per_file: Maximum number of matches returned per file.
+        limit: Maximum number of matches per page.
+        cursor: The `next_cursor` of a previous call, to fetch the next page.
 
     Returns:
-        A list of matching lines with file paths and line numbers.
+        A dict with 'matches' (file, line, text, pattern) and 'next_cursor',
+        which is null once there are no more results.
     """
-    repo_id = _resolve_repo_id(repo_id)
+    from .services.code_search import search_files
+
+    repo_id = resolve_repo_id(repo_id)
     repo_path = os.path.join(os.getcwd(), "repos", repo_id)
-    matches = []
 
     if not os.path.exists(repo_path):
-        return ["Repository directory not found."]
+        return {"error": "Repository directory not found."}
 
-    for root, _, files in os.walk(repo_path):
-        if ".git" in root:
-            continue
-        for file in files:
-            path = os.path.join(root, file)
-            try:
-                with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
-                    if pattern in content:
-                        lines = content.split("\n")
-                        for i, line in enumerate(lines):
-                            if pattern in line:
-                                matches.append(f"{path}:{i+1}: {line.strip()}")
-            except Exception:
-                pass
-            if len(matches) > 20:
-                break
-
-    return matches if matches else ["No matches found."]
+    try:
+        return search_files(
+            repo_path,
+            [pattern] + list(patterns or []),
+            regex=regex,
+            ignore_case=ignore_case,
+            globs=glob,
+            max_per_file=max_per_file,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        return {"error": str(e)}
 
 
 @mcp.tool
@@ -365,80 +463,70 @@ def get_github_issues(repo_url: str) -> List[Dict[str, Any]]:
 @mcp.tool
 def list_repositories() -> List[Dict[str, Any]]:
     """
-    List all repositories and sync with Pinecone namespaces.
+    List all repositories. The registry is kept in sync with the vector store
+    namespaces by a periodic background task.
 
     Returns:
         A list of repository objects with id, name, url, status, etc.
     """
-    try:
-        from pinecone import Pinecone
-        from .core.config import settings
-
-        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        index = pc.Index(settings.PINECONE_INDEX)
-
-        stats = index.describe_index_stats()
-        active_namespaces = set(stats.namespaces.keys()) if stats.namespaces else set()
-
-        repos_changed = False
-
-        # Remove repos that claim "Indexed" but aren't in Pinecone
-        repos_to_delete = [
-            rid for rid, repo in repositories_db.items()
-            if repo["status"] == "Indexed" and rid not in active_namespaces
-        ]
-        for rid in repos_to_delete:
-            del repositories_db[rid]
-            repos_changed = True
-
-        # Add repos that are in Pinecone but missing locally
-        for ns in active_namespaces:
-            if ns not in repositories_db:
-                repositories_db[ns] = {
-                    "id": ns,
-                    "name": ns.replace("-", " ").title(),
-                    "url": f"https://github.com/unknown/{ns}",
-                    "status": "Indexed",
-                    "lastSynced": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "branch": "main",
-                    "language": "Unknown",
-                    "progress": 100,
-                    "status_message": "Discovered in Pinecone",
-                }
-                repos_changed = True
-
-        if repos_changed:
-            _save_repos(repositories_db)
-
-    except Exception as e:
-        print(f"Warning: Could not sync with Pinecone: {e}")
+    from .services.namespace_sync import get_namespace_sync
 
-    return list(repositories_db.values())
+    # Normally started with the API; covers the standalone MCP server
+    get_namespace_sync().start()
+    return get_repo_registry().all()
 
 
 @mcp.tool
-def ingest_repository(repo_url: str) -> Dict[str, Any]:
+def ingest_repository(repo_url: str, incremental: bool = True) -> Dict[str, Any]:
     """
     Start ingesting (clone + index) a new repository. Max 5 repos allowed.
-    Runs synchronously — for background processing, the FastAPI route wraps this.
+    Calling this again for an already indexed repository schedules a re-index,
+    which only re-embeds the files changed since the last indexed commit
+    unless `incremental` is false.
+    The work is queued and done by a background ingest worker process; poll
+    `get_ingest_job` or the repository status for progress.
 
     Args:
         repo_url: The git clone URL for the repository.
+        incremental: Only re-embed changed files when re-indexing.
 
     Returns:
-        Status dict with repo_id and message.
+        Status dict with repo_id, job_id and message.
     """
-    indexed_repos = [r for r in repositories_db.values() if r["status"] == "Indexed"]
-    if len(indexed_repos) >= 5:
-        return {"error": "Maximum 5 repositories allowed. Delete some first."}
+    from .services.ingest_queue import get_ingest_queue, get_worker_pool
 
     repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
     repo_id = repo_name.lower().replace(" ", "-").replace("_", "-")
 
-    if repo_id in repositories_db:
-        return {"error": "Repository already indexed or being indexed"}
+    registry = get_repo_registry()
+    queue = get_ingest_queue()
+    existing = registry.get(repo_id)
+    if existing:
+        job = queue.enqueue(repo_id, existing.get("url") or repo_url, incremental)
+        if not job["created"]:
+            return {"error": "Repository is already being indexed", "job_id": job["id"]}
+
+        registry.update(
+            repo_id,
+            status="Indexing",
+            stage="queued",
+            progress=0,
+            status_message=f"Queued re-index for {repo_name}...",
+        )
+        get_worker_pool().ensure_running()
 
-    repositories_db[repo_id] = {
+        return {
+            "status": "success",
+            "message": f"Started re-indexing repository: {repo_name}",
+            "repo_id": repo_id,
+            "job_id": job["id"],
+        }
+
+    indexed_repos = [r for r in registry.all() if r["status"] == "Indexed"]
+    if len(indexed_repos) >= 5:
+        return {"error": "Maximum 5 repositories allowed. Delete some first."}
+
+    added = registry.add({
         "id": repo_id,
         "name": repo_name,
         "url": repo_url,
@@ -447,21 +535,90 @@ def ingest_repository(repo_url: str) -> Dict[str, Any]:
         "branch": "main",
         "language": "Python",
         "progress": 0,
-        "status_message": f"Starting ingestion for {repo_name}...",
-    }
-    _save_repos(repositories_db)
+        "stage": "queued",
+        "status_message": f"Queued ingestion for {repo_name}...",
+    })
+    if not added:
+        return {"error": "Repository is already being indexed"}
+
+    job = queue.enqueue(repo_id, repo_url, incremental)
+    get_worker_pool().ensure_running()
 
     return {
         "status": "success",
         "message": f"Started ingesting repository: {repo_name} ({len(indexed_repos) + 1}/5)",
         "repo_id": repo_id,
+        "job_id": job["id"],
     }
 
 
+async def stream_ingest_progress(repo_id: str):
+    """
+    Progress events of a repository's ingest, shared by the
+    `ingest_repository_stream` tool and the /api/ingest/{repo_id}/events
+    route. Yields {"type": "progress", "stage", "progress", "message",
+    "stats"} events and ends with a "done" or "error" event; None marks a
+    quiet period (for keep-alives).
+    """
+    from .services.ingest_progress import get_progress_hub
+
+    async for event in get_progress_hub().subscribe(resolve_repo_id(repo_id)):
+        yield event
+
+
+@mcp.tool
+async def ingest_repository_stream(repo_url: str, ctx: Context, incremental: bool = True) -> Dict[str, Any]:
+    """
+    Same as `ingest_repository`, but stays open until the ingest finishes:
+    every progress update (stage, files, chunks, throughput, ETA) is sent as a
+    log notification carrying a JSON event and reported as progress out of 100.
+
+    Args:
+        repo_url: The git clone URL for the repository.
+        incremental: Only re-embed changed files when re-indexing.
+
+    Returns:
+        The final event: type "done" (with the repository status) or "error".
+    """
+    result = ingest_repository(repo_url=repo_url, incremental=incremental)
+    if "error" in result:
+        return result
+
+    async for event in stream_ingest_progress(result["repo_id"]):
+        if event is None:
+            continue
+        await ctx.report_progress(progress=event.get("progress", 0), total=100)
+        if event["type"] != "progress":
+            return {**event, "job_id": result["job_id"]}
+        await ctx.info(json.dumps(event))
+
+    return {"error": "Progress stream ended unexpectedly", "job_id": result["job_id"]}
+
+
+@mcp.tool
+def get_ingest_job(job_id: str) -> Dict[str, Any]:
+    """
+    Get the state of an ingest job started by `ingest_repository`.
+
+    Args:
+        job_id: The job_id returned by ingest_repository.
+
+    Returns:
+        The job: repo_id, state (queued, running, succeeded, failed or
+        cancelled), attempts, max_attempts, error and timestamps.
+    """
+    from .services.ingest_queue import get_ingest_queue
+
+    job = get_ingest_queue().get(job_id)
+    if job is None:
+        return {"error": "Ingest job not found"}
+    return job
+
+
 @mcp.tool
 def delete_repository(repo_id: str) -> Dict[str, Any]:
     """
-    Delete a repository and its vectors from Pinecone.
+    Delete a repository and its vectors from the vector store.
 
     Args:
         repo_id: The ID of the repository to delete.
@@ -469,21 +626,23 @@ def delete_repository(repo_id: str) -> Dict[str, Any]:
     Returns:
         Status dict confirming deletion.
     """
-    repo_id = _resolve_repo_id(repo_id)
+    repo_id = resolve_repo_id(repo_id)
 
-    if repo_id not in repositories_db:
+    registry = get_repo_registry()
+    if repo_id not in registry:
         return {"error": "Repository not found"}
 
     try:
-        from pinecone import Pinecone
-        from .core.config import settings
+        from .services import answer_cache, bm25_index
+        from .services.ingest_queue import get_ingest_queue
+        from .services.vector_store import get_vector_store
 
-        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        index = pc.Index(settings.PINECONE_INDEX)
-        index.delete(delete_all=True, namespace=repo_id)
+        get_ingest_queue().cancel(repo_id)
+        get_vector_store().delete_namespace(repo_id)
+        bm25_index.delete_index(repo_id)
+        answer_cache.invalidate(repo_id)
 
-        del repositories_db[repo_id]
-        _save_repos(repositories_db)
+        registry.delete(repo_id)
 
         return {"status": "success", "message": "Repository deleted"}
     except Exception as e:
@@ -493,26 +652,28 @@ def delete_repository(repo_id: str) -> Dict[str, Any]:
 @mcp.tool
 def clear_all_repositories() -> Dict[str, Any]:
     """
-    Clear all repositories and their vectors from Pinecone.
+    Clear all repositories and their vectors from the vector store.
 
     Returns:
         Status dict confirming all repos cleared.
     """
     try:
-        from pinecone import Pinecone
-        from .core.config import settings
-
-        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        index = pc.Index(settings.PINECONE_INDEX)
-
-        for rid in list(repositories_db.keys()):
+        from .services import answer_cache, bm25_index
+        from .services.ingest_queue import get_ingest_queue
+        from .services.vector_store import get_vector_store
+
+        get_ingest_queue().cancel()
+        registry = get_repo_registry()
+        store = get_vector_store()
+        for rid in registry.ids():
             try:
-                index.delete(delete_all=True, namespace=rid)
+                store.delete_namespace(rid)
+                bm25_index.delete_index(rid)
             except Exception:
                 pass
 
-        repositories_db.clear()
-        _save_repos(repositories_db)
+        registry.clear()
+        answer_cache.invalidate()
 
         return {"status": "success", "message": "All repositories cleared"}
     except Exception as e:
@@ -0,0 +1,119 @@
+"""
+Semantic answer cache for `query_codebase`.
+
+Answers are cached per repository together with the commit that was indexed
+when they were generated and the embedding of the question. A later question
+about the same repository at the same commit whose embedding is at least
+`settings.ANSWER_CACHE_THRESHOLD` cosine-similar reuses the answer instead of
+running the agent graph again. A repository's entries are dropped whenever it
+is re-ingested or deleted.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from ..core.config import settings
+
+
+class AnswerCache:
+    """Per-repository LRU of (commit, normalised query vector, answer)."""
+
+    def __init__(self, max_per_repo: int, threshold: float):
+        import numpy as np
+
+        self.np = np
+        self.max_per_repo = max_per_repo
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._repos: Dict[str, "OrderedDict[int, Dict[str, Any]]"] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _normalise(self, vector):
+        vec = self.np.asarray(vector, dtype=self.np.float32)
+        return vec / (self.np.linalg.norm(vec) or 1.0)
+
+    def get(self, repo_id: str, commit: str, vector) -> Optional[Dict[str, Any]]:
+        """Cached answer for the most similar question above the threshold."""
+        q = self._normalise(vector)
+        with self._lock:
+            entries = self._repos.get(repo_id)
+            best_id, best_score = None, self.threshold
+            if entries:
+                for entry_id, entry in entries.items():
+                    if entry["commit"] != commit:
+                        continue
+                    score = float(entry["vector"] @ q)
+                    if score >= best_score:
+                        best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(best_id)
+            self.hits += 1
+            entry = entries[best_id]
+            return {"query": entry["query"], "answer": dict(entry["answer"]), "similarity": round(best_score, 4)}
+
+    def put(self, repo_id: str, commit: str, query: str, vector, answer: Dict[str, Any]):
+        entry = {
+            "commit": commit,
+            "query": query,
+            "vector": self._normalise(vector),
+            "answer": dict(answer),
+            "created": time.time(),
+        }
+        with self._lock:
+            entries = self._repos.setdefault(repo_id, OrderedDict())
+            # Entries for an older commit can never match again
+            for entry_id in [i for i, e in entries.items() if e["commit"] != commit]:
+                del entries[entry_id]
+            entries[self._next_id] = entry
+            self._next_id += 1
+            while len(entries) > self.max_per_repo:
+                entries.popitem(last=False)
+
+    def invalidate(self, repo_id: Optional[str] = None):
+        """Drop the entries of one repository, or of all of them."""
+        with self._lock:
+            if repo_id is None:
+                self._repos.clear()
+            else:
+                self._repos.pop(repo_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        with self._lock:
+            size = sum(len(entries) for entries in self._repos.values())
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+_answer_cache: Optional[AnswerCache] = None
+_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide answer cache, or None when disabled (ANSWER_CACHE_SIZE=0)."""
+    global _answer_cache
+    if settings.ANSWER_CACHE_SIZE <= 0:
+        return None
+    if _answer_cache is None:
+        with _lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache(
+                    max_per_repo=settings.ANSWER_CACHE_SIZE,
+                    threshold=settings.ANSWER_CACHE_THRESHOLD,
+                )
+    return _answer_cache
+
+
+def invalidate(repo_id: Optional[str] = None):
+    """Forget cached answers of a re-ingested or deleted repository."""
+    if _answer_cache is not None:
+        _answer_cache.invalidate(repo_id)
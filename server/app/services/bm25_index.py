@@ -0,0 +1,303 @@
+"""
+Per-repository BM25 index for lexical retrieval.
+
+Vector search with a small sentence model is poor at exact identifiers and
+error strings, so every repository also gets a BM25 inverted index over the
+same chunks (and chunk ids) that are embedded. Hybrid search fuses both
+rankings.
+
+The index is a SQLite file per repository namespace under
+`settings.BM25_INDEX_DIR`. Postings are stored as packed uint32 chunk ids and
+uint16 term frequencies, and chunk texts are zlib-compressed. A query opens
+the index lazily on first use and then only reads the postings of its own
+terms. An incremental ingest replaces only the chunks of changed files and
+rewrites the postings of their terms (`update_index`).
+"""
+import math
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..core.config import settings
+
+K1 = 1.2
+B = 0.75
+
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def index_path(namespace: str) -> str:
+    return os.path.join(os.getcwd(), settings.BM25_INDEX_DIR, f"{namespace}.sqlite3")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased code-aware terms: every identifier, plus its snake_case and
+    camelCase parts, so `getUserName` also matches "user name".
+    """
+    terms = []
+    for word in _WORD_RE.findall(text):
+        lower = word.lower()
+        terms.append(lower)
+        parts = [p.lower() for piece in word.split("_") for p in _CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            terms.extend(p for p in parts if len(p) > 1)
+    return terms
+
+
+def build_index(namespace: str, chunks: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    (Re)build the index of a namespace from chunks with "id", "text",
+    "source" and line range, as produced by `ingestion.split_documents`.
+    """
+    started = time.monotonic()
+    docs = []
+    postings: Dict[str, Dict[int, int]] = {}  # term -> {doc id: term frequency}
+    total_length = 0
+
+    for doc_id, chunk in enumerate(chunks):
+        doc = _doc_row(doc_id, chunk, postings)
+        total_length += doc[5]
+        docs.append(doc)
+
+    target = index_path(namespace)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(
+            "CREATE TABLE docs (id INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL, "
+            "source TEXT NOT NULL, start_line INTEGER, end_line INTEGER, "
+            "length INTEGER NOT NULL, text BLOB NOT NULL)"
+        )
+        conn.execute("CREATE TABLE postings (term TEXT PRIMARY KEY, doc_ids BLOB NOT NULL, tfs BLOB NOT NULL)")
+        conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)", docs)
+        conn.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?)",
+            (
+                (term, array("I", tfs.keys()).tobytes(), array("H", tfs.values()).tobytes())
+                for term, tfs in postings.items()
+            ),
+        )
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("docs", str(len(docs))),
+            ("avg_length", str(total_length / len(docs) if docs else 0.0)),
+            ("built_at", str(time.time())),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, target)
+    _forget(namespace)
+
+    return {
+        "chunks": len(docs),
+        "terms": len(postings),
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+def _doc_row(doc_id: int, chunk: Dict[str, Any], postings: Dict[str, Dict[int, int]]) -> tuple:
+    """Row of the docs table for a chunk; its term frequencies are added to `postings`."""
+    terms = tokenize(chunk["text"])
+    counts: Dict[str, int] = {}
+    for term in terms:
+        counts[term] = counts.get(term, 0) + 1
+    for term, tf in counts.items():
+        postings.setdefault(term, {})[doc_id] = min(tf, 65535)
+    return (
+        doc_id, chunk["id"], chunk.get("source", ""),
+        chunk.get("start_line"), chunk.get("end_line"), len(terms),
+        zlib.compress(chunk["text"].encode("utf-8")),
+    )
+
+
+def update_index(namespace: str, chunks: Iterable[Dict[str, Any]], stale_sources: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """
+    Replace the chunks of `stale_sources` (modified and removed files) with
+    `chunks`, rewriting only the postings of the terms they contain. Returns
+    None when the namespace has no index yet; build it with `build_index`.
+
+    The update is applied to a copy of the index that then replaces it, so
+    open readers keep a consistent view. Document ids freed by removed chunks
+    are reused, keeping the id space as dense as a full rebuild.
+    """
+    target = index_path(namespace)
+    if not os.path.exists(target):
+        return None
+
+    started = time.monotonic()
+    tmp = target + ".tmp"
+    shutil.copyfile(target, tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        stale = list(set(stale_sources))
+        removed = set()
+        touched = set()
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(stale), 500):
+            part = stale[i:i + 500]
+            for doc_id, text in conn.execute(
+                f"SELECT id, text FROM docs WHERE source IN ({','.join('?' * len(part))})", part
+            ):
+                removed.add(doc_id)
+                touched.update(tokenize(zlib.decompress(text).decode("utf-8")))
+        conn.executemany("DELETE FROM docs WHERE id = ?", ((d,) for d in removed))
+
+        used = {doc_id for (doc_id,) in conn.execute("SELECT id FROM docs")}
+        next_id = max(used, default=-1) + 1
+        free = iter(sorted(set(range(next_id)) - used))
+
+        docs = []
+        added: Dict[str, Dict[int, int]] = {}
+        for chunk in chunks:
+            doc_id = next(free, None)
+            if doc_id is None:
+                doc_id, next_id = next_id, next_id + 1
+            docs.append(_doc_row(doc_id, chunk, added))
+        conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)", docs)
+        touched.update(added)
+
+        for term in touched:
+            tfs: Dict[int, int] = {}
+            row = conn.execute("SELECT doc_ids, tfs FROM postings WHERE term = ?", (term,)).fetchone()
+            if row is not None:
+                ids, freqs = array("I"), array("H")
+                ids.frombytes(row[0])
+                freqs.frombytes(row[1])
+                tfs = {d: tf for d, tf in zip(ids, freqs) if d not in removed}
+            tfs.update(added.get(term, {}))
+            if tfs:
+                conn.execute(
+                    "INSERT OR REPLACE INTO postings VALUES (?, ?, ?)",
+                    (term, array("I", tfs.keys()).tobytes(), array("H", tfs.values()).tobytes()),
+                )
+            else:
+                conn.execute("DELETE FROM postings WHERE term = ?", (term,))
+
+        count, total_length = conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+        conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+            ("docs", str(count)),
+            ("avg_length", str(total_length / count if count else 0.0)),
+            ("built_at", str(time.time())),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, target)
+    _forget(namespace)
+
+    return {
+        "chunks": count,
+        "added": len(docs),
+        "removed": len(removed),
+        "terms": len(touched),
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+class BM25Index:
+    """Read side of one namespace's index. Document lengths are held in memory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self.docs = int(meta["docs"])
+        self.avg_length = float(meta["avg_length"]) or 1.0
+        # Indexed by doc id; ids freed by an incremental update may leave holes
+        rows = self._conn.execute("SELECT id, length FROM docs").fetchall()
+        self.lengths = array("I", bytes(4 * (max((doc_id for doc_id, _ in rows), default=-1) + 1)))
+        for doc_id, length in rows:
+            self.lengths[doc_id] = length
+
+    def close(self):
+        self._conn.close()
+
+    def __del__(self):
+        conn = getattr(self, "_conn", None)
+        if conn is not None:
+            conn.close()
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Best chunks for `query` as {"id", "score", "metadata": {"text", "source", "start_line", "end_line"}}."""
+        terms = set(tokenize(query))
+        if not terms or not self.docs:
+            return []
+
+        scores: Dict[int, float] = {}
+        with self._lock:
+            for term in terms:
+                row = self._conn.execute("SELECT doc_ids, tfs FROM postings WHERE term = ?", (term,)).fetchone()
+                if row is None:
+                    continue
+                ids, tfs = array("I"), array("H")
+                ids.frombytes(row[0])
+                tfs.frombytes(row[1])
+                idf = math.log(1 + (self.docs - len(ids) + 0.5) / (len(ids) + 0.5))
+                for doc_id, tf in zip(ids, tfs):
+                    norm = K1 * (1 - B + B * self.lengths[doc_id] / self.avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+
+            best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+            rows = {
+                row[0]: row[1:]
+                for row in self._conn.execute(
+                    "SELECT id, chunk_id, source, start_line, end_line, text FROM docs "
+                    f"WHERE id IN ({','.join('?' * len(best))})", best
+                )
+            } if best else {}
+
+        results = []
+        for d in best:
+            chunk_id, source, start_line, end_line, text = rows[d]
+            metadata = {"text": zlib.decompress(text).decode("utf-8"), "source": source}
+            if start_line:
+                metadata.update(start_line=start_line, end_line=end_line)
+            results.append({"id": chunk_id, "score": round(scores[d], 4), "metadata": metadata})
+        return results
+
+
+_indexes: Dict[str, BM25Index] = {}
+_lock = threading.Lock()
+
+
+# A replaced index is only dropped from the cache, never closed here: another
+# thread may still be searching it. Its connection closes when the last
+# reference to it goes away.
+
+
+def _forget(namespace: str):
+    with _lock:
+        _indexes.pop(namespace, None)
+
+
+def get_index(namespace: str) -> Optional[BM25Index]:
+    """The namespace's index, loaded on first use (and after a rebuild), or None."""
+    path = index_path(namespace)
+    if not os.path.exists(path):
+        return None
+    with _lock:
+        index = _indexes.get(namespace)
+        if index is None or index.mtime != os.path.getmtime(path):
+            index = _indexes[namespace] = BM25Index(path)
+        return index
+
+
+def delete_index(namespace: str):
+    _forget(namespace)
+    path = index_path(namespace)
+    if os.path.exists(path):
+        os.remove(path)
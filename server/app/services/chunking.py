@@ -0,0 +1,266 @@
+"""
+Code-aware chunking.
+
+Files are cut on syntactic boundaries instead of fixed character windows:
+
+- Python: top-level statements from the `ast` (functions and classes with
+  their decorators and leading comments, runs of imports/assignments).
+- C-like languages (JS/TS, Go, Java, Rust, C/C++): top-level declarations
+  found by tracking brace depth with a small tokenizer that skips strings and
+  comments.
+- Markdown: sections between headings.
+- Anything else, or a file that does not parse: plain line windows.
+
+Consecutive small units are packed together up to `max_chars`, and a unit
+that is too large is split at the next level down (class methods, nested
+blocks) before falling back to line windows. Chunks do not overlap, and each
+carries its 1-based `start_line`/`end_line`.
+"""
+import ast
+import os
+from typing import Dict, List, Tuple
+
+from ..core.config import settings
+
+BRACE_LANGUAGES = (".js", ".jsx", ".ts", ".tsx", ".go", ".java", ".rs", ".c", ".cpp", ".h")
+MARKDOWN = (".md",)
+
+Span = Tuple[int, int]  # 0-based, end exclusive line indexes
+
+
+def _size(lines: List[str], span: Span) -> int:
+    return sum(len(line) + 1 for line in lines[span[0]:span[1]])
+
+
+def _windows(lines: List[str], span: Span, max_chars: int) -> List[Span]:
+    """Split a span into consecutive line windows of at most `max_chars`."""
+    spans = []
+    start, size = span[0], 0
+    for i in range(span[0], span[1]):
+        n = len(lines[i]) + 1
+        if size and size + n > max_chars:
+            spans.append((start, i))
+            start, size = i, 0
+        size += n
+    if start < span[1]:
+        spans.append((start, span[1]))
+    return spans
+
+
+def _pack(lines: List[str], units: List[Span], max_chars: int) -> List[Span]:
+    """Merge consecutive units while they fit in `max_chars`."""
+    packed: List[Span] = []
+    size = 0
+    for unit in units:
+        n = _size(lines, unit)
+        if packed and size + n <= max_chars:
+            packed[-1] = (packed[-1][0], unit[1])
+            size += n
+        else:
+            packed.append(unit)
+            size = n
+    return packed
+
+
+def _contiguous(starts: List[int], span: Span) -> List[Span]:
+    """Turn unit start lines into spans that cover `span` without gaps."""
+    starts = sorted({s for s in starts if span[0] < s < span[1]})
+    bounds = [span[0]] + starts + [span[1]]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+
+# ---------------------------------------------------------------------------
+# Python
+# ---------------------------------------------------------------------------
+
+
+def _node_start(node: ast.AST) -> int:
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators]) - 1
+
+
+def _python_units(lines: List[str], body: List[ast.stmt], span: Span, max_chars: int) -> List[Span]:
+    starts = []
+    previous_is_def = True
+    for node in body:
+        is_def = isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        # Every def starts a unit; other statements are grouped into runs
+        if is_def or previous_is_def:
+            start = _node_start(node)
+            # Keep comments directly above a definition with it
+            while is_def and start - 1 >= span[0] and lines[start - 1].lstrip().startswith("#"):
+                start -= 1
+            starts.append(start)
+        previous_is_def = is_def
+
+    units = []
+    nodes = {_node_start(n): n for n in body}
+    for unit in _contiguous(starts, span):
+        if _size(lines, unit) <= max_chars:
+            units.append(unit)
+            continue
+        node = next((n for s, n in nodes.items() if unit[0] <= s < unit[1] and isinstance(n, ast.ClassDef)), None)
+        if node is not None and node.body:
+            # Oversized class: header + one unit per method
+            body_start = _node_start(node.body[0])
+            if body_start > unit[0]:
+                units.append((unit[0], body_start))
+            units.extend(_python_units(lines, node.body, (body_start, unit[1]), max_chars))
+        else:
+            units.extend(_windows(lines, unit, max_chars))
+    return units
+
+
+def _chunk_python(text: str, lines: List[str], max_chars: int) -> List[Span]:
+    tree = ast.parse(text)
+    if not tree.body:
+        return _windows(lines, (0, len(lines)), max_chars)
+    return _python_units(lines, tree.body, (0, len(lines)), max_chars)
+
+
+# ---------------------------------------------------------------------------
+# Brace languages
+# ---------------------------------------------------------------------------
+
+
+# Languages where ' delimits a one-character literal rather than a string
+CHAR_LITERAL_LANGUAGES = (".go", ".java", ".rs", ".c", ".cpp", ".h")
+
+
+def _char_literal_end(line: str, i: int) -> int:
+    """
+    Index of the quote closing a char literal opened at `line[i]`, or -1 when
+    the quote does not close within a few characters (a Rust lifetime or
+    loop label such as `'a` or `'outer:`).
+    """
+    if line[i + 1:i + 2] == "\\":
+        return line.find("'", i + 3, i + 13)  # '\n', '\x41', '\u{1F600}'
+    return i + 2 if line[i + 2:i + 3] == "'" else -1
+
+
+def _brace_depths(lines: List[str], char_literals: bool = False) -> List[int]:
+    """
+    Brace depth at the end of every line, ignoring strings and comments.
+    With `char_literals`, ' only starts a char literal that closes nearby.
+    """
+    depths = []
+    depth = 0
+    in_block_comment = False
+    quote = None
+    for line in lines:
+        i = 0
+        while i < len(line):
+            c = line[i]
+            nxt = line[i + 1] if i + 1 < len(line) else ""
+            if in_block_comment:
+                if c == "*" and nxt == "/":
+                    in_block_comment = False
+                    i += 1
+            elif quote:
+                if c == "\\":
+                    i += 1
+                elif c == quote:
+                    quote = None
+            elif c == "/" and nxt == "/":
+                break
+            elif c == "/" and nxt == "*":
+                in_block_comment = True
+                i += 1
+            elif c == "'" and char_literals:
+                end = _char_literal_end(line, i)
+                if end > i:
+                    i = end
+            elif c in "\"'`":
+                quote = c
+            elif c == "{":
+                depth += 1
+            elif c == "}":
+                depth = max(depth - 1, 0)
+            i += 1
+        if quote and quote != "`":
+            quote = None  # Only template literals span lines
+        depths.append(depth)
+    return depths
+
+
+def _brace_units(lines: List[str], depths: List[int], span: Span, level: int, max_chars: int) -> List[Span]:
+    # A unit ends on a line at depth `level` that closes a block, ends a
+    # statement or is followed by a blank line
+    starts = []
+    for i in range(span[0], span[1] - 1):
+        if depths[i] != level:
+            continue
+        before = depths[i - 1] if i > 0 else 0
+        if before > level or lines[i].rstrip().endswith((";", "}")) or not lines[i + 1].strip():
+            starts.append(i + 1)
+
+    units = []
+    for unit in _contiguous(starts, span):
+        if _size(lines, unit) <= max_chars:
+            units.append(unit)
+        elif unit[1] - unit[0] > 2 and any(d > level + 1 for d in depths[unit[0]:unit[1] - 1]):
+            # Split the body at the next nesting level (e.g. class methods)
+            header = (unit[0], unit[0] + 1)
+            inner = _brace_units(lines, depths, (unit[0] + 1, unit[1]), level + 1, max_chars)
+            units.extend([header] + inner)
+        else:
+            units.extend(_windows(lines, unit, max_chars))
+    return units
+
+
+def _chunk_braces(lines: List[str], max_chars: int, char_literals: bool = False) -> List[Span]:
+    return _brace_units(lines, _brace_depths(lines, char_literals), (0, len(lines)), 0, max_chars)
+
+
+# ---------------------------------------------------------------------------
+# Markdown
+# ---------------------------------------------------------------------------
+
+
+def _chunk_markdown(lines: List[str], max_chars: int) -> List[Span]:
+    starts = []
+    in_fence = False
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        elif not in_fence and line.startswith("#"):
+            starts.append(i)
+    units = []
+    for unit in _contiguous(starts, (0, len(lines))):
+        units.extend(_windows(lines, unit, max_chars) if _size(lines, unit) > max_chars else [unit])
+    return units
+
+
+def chunk_file(path: str, text: str, max_chars: int = None) -> List[Dict]:
+    """
+    Split one file into chunks of {"text", "start_line", "end_line"}
+    (1-based, inclusive).
+    """
+    max_chars = max_chars or settings.CHUNK_MAX_CHARS
+    # Split only on the line breaks `ast` counts: str.splitlines() also breaks
+    # on form feeds, \u2028 and other separators, shifting every later line number
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    if not lines:
+        return []
+
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".py":
+            units = _chunk_python(text, lines, max_chars)
+        elif ext in BRACE_LANGUAGES:
+            units = _chunk_braces(lines, max_chars, char_literals=ext in CHAR_LITERAL_LANGUAGES)
+        elif ext in MARKDOWN:
+            units = _chunk_markdown(lines, max_chars)
+        else:
+            units = _windows(lines, (0, len(lines)), max_chars)
+    except (SyntaxError, ValueError, RecursionError):
+        units = _windows(lines, (0, len(lines)), max_chars)
+
+    chunks = []
+    for start, end in _pack(lines, units, max_chars):
+        chunk_text = "\n".join(lines[start:end])
+        if chunk_text.strip():
+            chunks.append({"text": chunk_text, "start_line": start + 1, "end_line": end})
+    return chunks
@@ -0,0 +1,212 @@
+"""
+Grep engine behind `search_code_files` and `search_code_fs`.
+
+Supports literal or regex patterns (any of several may match), case-insensitive
+matching, file-glob filters, a per-file match cap and cursor-based pagination.
+Files are visited in sorted path order and the cursor records where a page
+stopped, so the next page resumes there instead of rescanning from the start.
+The trigram index narrows the files that are opened whenever a literal
+substring can be derived from every pattern.
+"""
+import base64
+import json
+import os
+import re
+from fnmatch import fnmatch
+from typing import Any, Dict, List, Optional
+
+from .trigram_index import candidate_files
+
+MAX_LINE_CHARS = 300
+_OCTAL = "01234567"
+
+
+def _escape_end(pattern: str, i: int) -> int:
+    """
+    Index just past the escape starting at `pattern[i]` (a backslash), or -1
+    when it is malformed. Multi-character escapes (\\x41, \\u0041, \\U00000041,
+    \\N{...}, octal \\101 and backreferences \\1) are consumed whole.
+    """
+    nxt = pattern[i + 1]
+    j = i + 2
+    if nxt in "xuU":
+        j += {"x": 2, "u": 4, "U": 8}[nxt]
+        return j if j <= len(pattern) else -1
+    if nxt == "N":
+        end = pattern.find("}", j)
+        return end + 1 if pattern.startswith("{", j) and end > 0 else -1
+    if nxt == "0":
+        while j < len(pattern) and j < i + 4 and pattern[j] in _OCTAL:
+            j += 1
+        return j
+    if nxt.isdigit():
+        digits = pattern[j:j + 2]
+        if nxt in _OCTAL and len(digits) == 2 and all(d in _OCTAL for d in digits):
+            return j + 2  # Octal escape such as \\101
+        if j < len(pattern) and pattern[j].isdigit():
+            j += 1  # Two-digit backreference
+        return j
+    return j
+
+
+def required_literal(pattern: str) -> str:
+    """
+    Longest literal substring that every match of the regex `pattern` must
+    contain, or "" when none can be derived safely.
+    """
+    if "|" in pattern:
+        return ""
+
+    best, run = "", ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            i = _escape_end(pattern, i)
+            if i < 0:
+                return ""  # Malformed escape: let the search scan every file
+            if depth == 0 and not nxt.isalnum():
+                run += nxt  # Escaped punctuation is a literal character
+                continue
+        elif c == "[":
+            # Skip the character class
+            i += 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+        elif c == "(":
+            depth += 1
+            i += 1
+        elif c == ")":
+            depth = max(depth - 1, 0)
+            i += 1
+        elif c in "?*{":
+            run = run[:-1]  # The preceding character is optional
+            i = pattern.find("}", i) + 1 if c == "{" else i + 1
+            if i == 0:
+                return ""  # Unbalanced brace
+        elif c in "+.^$":
+            i += 1
+        else:
+            i += 1
+            if depth == 0:
+                run += c
+                continue
+        best = max(best, run, key=len)
+        run = ""
+    return max(best, run, key=len)
+
+
+def _encode_cursor(path: str, line: int, count: int) -> str:
+    raw = json.dumps({"f": path, "l": line, "n": count}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return {"f": str(data["f"]), "l": int(data["l"]), "n": int(data["n"])}
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _list_files(repo_dir: str, patterns: List[str], regex: bool) -> List[str]:
+    """Sorted relative paths that may contain a match."""
+    literals = [required_literal(p) if regex else p for p in patterns]
+    if all(len(lit) >= 3 for lit in literals):
+        found = set()
+        for lit in literals:
+            candidates = candidate_files(repo_dir, lit)
+            if candidates is None:
+                break
+            found.update(candidates)
+        else:
+            return sorted(found)
+
+    paths = []
+    for root, _, names in os.walk(repo_dir):
+        if ".git" in root:
+            continue
+        for name in names:
+            paths.append(os.path.relpath(os.path.join(root, name), repo_dir).replace(os.sep, "/"))
+    return sorted(paths)
+
+
+def search_files(
+    repo_dir: str,
+    patterns: List[str],
+    regex: bool = False,
+    ignore_case: bool = False,
+    globs: Optional[List[str]] = None,
+    max_per_file: int = 20,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Search `repo_dir` for lines matching any of `patterns`.
+
+    Returns {"matches": [{"file", "line", "text", "pattern"}], "next_cursor"},
+    where `next_cursor` is None once the results are exhausted.
+    Raises ValueError for an invalid regex or cursor, or a `limit` or
+    `max_per_file` below 1 (a cursor could never advance past them).
+    """
+    if limit < 1 or max_per_file < 1:
+        raise ValueError("limit and max_per_file must be at least 1")
+
+    patterns = [p for p in patterns if p]
+    if not patterns:
+        return {"matches": [], "next_cursor": None}
+
+    flags = re.IGNORECASE if ignore_case else 0
+    try:
+        compiled = [
+            (p, re.compile(p if regex else re.escape(p), flags))
+            for p in patterns
+        ]
+    except re.error as e:
+        raise ValueError(f"Invalid regex: {e}")
+
+    start = _decode_cursor(cursor) if cursor else None
+    matches: List[Dict[str, Any]] = []
+
+    for rel in _list_files(repo_dir, patterns, regex):
+        if start and rel < start["f"]:
+            continue
+        if globs and not any(fnmatch(rel, g) or fnmatch(os.path.basename(rel), g) for g in globs):
+            continue
+
+        resume = start is not None and rel == start["f"]
+        skip_lines = start["l"] if resume else 0
+        in_file = start["n"] if resume else 0
+        start = None
+        if in_file >= max_per_file:
+            continue
+
+        try:
+            with open(os.path.join(repo_dir, rel), "r", encoding="utf-8", errors="ignore") as f:
+                for line_no, line in enumerate(f, start=1):
+                    if line_no <= skip_lines:
+                        continue
+                    for pattern, rx in compiled:
+                        if rx.search(line):
+                            if len(matches) >= limit:
+                                return {
+                                    "matches": matches,
+                                    "next_cursor": _encode_cursor(rel, line_no - 1, in_file),
+                                }
+                            matches.append({
+                                "file": rel,
+                                "line": line_no,
+                                "text": line.strip()[:MAX_LINE_CHARS],
+                                "pattern": pattern,
+                            })
+                            in_file += 1
+                            break
+                    if in_file >= max_per_file:
+                        break
+        except OSError:
+            continue
+
+    return {"matches": matches, "next_cursor": None}
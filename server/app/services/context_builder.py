@@ -0,0 +1,141 @@
+"""
+Prompt context assembly for the ReasoningAgent.
+
+Retrieved chunks arrive as match dicts ({"file", "content", "score", ...}).
+`build_context` drops duplicates, merges chunks of the same file that overlap
+or touch (e.g. consecutive functions), labels each block with its repository
+path and line range, and packs the blocks, best first, into
+`settings.CONTEXT_TOKEN_BUDGET` tokens. Plain strings (GitHub issues, tool
+errors) are added verbatim ahead of the code.
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from .reranker import estimate_tokens
+
+REPOS_DIR = os.path.join(os.getcwd(), "repos")
+
+
+def display_path(source: str) -> str:
+    """Path of a chunk's file relative to its repository root."""
+    try:
+        rel = os.path.relpath(source, REPOS_DIR)
+    except ValueError:
+        return source
+    if rel.startswith(".."):
+        return source
+    parts = rel.replace(os.sep, "/").split("/", 1)
+    return parts[1] if len(parts) == 2 else parts[0]
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception:
+        return None
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b`."""
+    for n in range(min(len(a), len(b)), 0, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+class _Block:
+    def __init__(self, file: str, text: str, rank: int, start: Optional[int], end: Optional[int]):
+        self.file = file
+        self.text = text
+        self.rank = rank          # Best (lowest) retrieval rank of the merged chunks
+        self.start = start        # 1-based line range, when known
+        self.end = end
+
+    def header(self) -> str:
+        path = display_path(self.file)
+        return f"--- {path}:{self.start}-{self.end} ---" if self.start else f"--- {path} ---"
+
+    def render(self) -> str:
+        return f"{self.header()}\n{self.text.strip()}"
+
+
+def _locate(chunks: List[Tuple[int, Dict[str, Any]]], file_text: Optional[str]):
+    """Attach line ranges to a file's chunks, from metadata or by finding them in the file."""
+    located = []
+    for rank, c in chunks:
+        text = c.get("content", "")
+        start, end = c.get("start_line"), c.get("end_line")
+        if not start and file_text is not None:
+            offset = file_text.find(text)
+            if offset >= 0:
+                start = file_text.count("\n", 0, offset) + 1
+                end = start + text.count("\n")
+        located.append((rank, text, start, end))
+    return located
+
+
+def _merge_file(file: str, chunks: List[Tuple[int, Dict[str, Any]]]) -> List[_Block]:
+    file_text = _read(file)
+    lines = file_text.splitlines() if file_text is not None else None
+    located = _locate(chunks, file_text)
+
+    blocks: List[_Block] = []
+    seen = set()
+    # Chunks with a known position are merged by line range; the rest by text overlap
+    for rank, text, start, end in sorted(located, key=lambda x: (x[2] is None, x[2] or 0, x[0])):
+        if text in seen:
+            continue
+        seen.add(text)
+        prev = blocks[-1] if blocks else None
+        if prev and start and prev.start and start <= prev.end + 1:
+            prev.end = max(prev.end, end)
+            prev.rank = min(prev.rank, rank)
+            if lines is not None:
+                prev.text = "\n".join(lines[prev.start - 1:prev.end])
+            else:
+                prev.text += text[_overlap(prev.text, text):]
+        elif prev and not start and not prev.start and _overlap(prev.text, text) > 0:
+            prev.text += text[_overlap(prev.text, text):]
+            prev.rank = min(prev.rank, rank)
+        elif any(text in b.text for b in blocks):
+            continue  # Contained in an earlier block
+        else:
+            blocks.append(_Block(file, text, rank, start, end))
+    return blocks
+
+
+def build_context(context: List[Any], token_budget: Optional[int] = None) -> str:
+    """Compact, deduplicated, budgeted prompt context from retrieved items."""
+    token_budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    notes: List[str] = []
+    by_file: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for rank, item in enumerate(context):
+        if isinstance(item, dict) and "content" in item:
+            by_file.setdefault(item.get("file", "unknown"), []).append((rank, item))
+        elif isinstance(item, dict) and "error" in item:
+            notes.append(f"Search error: {item['error']}")
+        elif item:
+            notes.append(str(item))
+
+    blocks: List[_Block] = []
+    for file, chunks in by_file.items():
+        blocks.extend(_merge_file(file, chunks))
+    blocks.sort(key=lambda b: b.rank)
+
+    parts: List[str] = []
+    used = 0
+    for text in notes + [b.render() for b in blocks]:
+        tokens = estimate_tokens(text)
+        if token_budget and used + tokens > token_budget:
+            if not parts:
+                # Always include something: cut the first item to the budget
+                parts.append(text[:token_budget * 4])
+                used = token_budget
+            continue
+        parts.append(text)
+        used += tokens
+
+    return "\n\n".join(parts)
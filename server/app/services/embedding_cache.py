@@ -0,0 +1,158 @@
+"""
+Content-addressed embedding cache.
+
+Chunk vectors are stored in a SQLite file keyed by (model name, SHA-256 of the
+chunk text), so re-ingesting a repository, or ingesting the same vendored file
+in several repositories, only embeds chunks that have never been seen before.
+The file is kept under `settings.EMBEDDING_CACHE_MAX_MB` by evicting the least
+recently used vectors.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+from ..core.config import settings
+
+
+class EmbeddingCache:
+    def __init__(self, path: Optional[str] = None, max_mb: Optional[int] = None, model: Optional[str] = None):
+        self.path = path or os.path.join(os.getcwd(), settings.EMBEDDING_CACHE_PATH)
+        self.max_bytes = (settings.EMBEDDING_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+        self.model = model or settings.EMBEDDING_MODEL
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE.
+        # Several ingest workers share the file, so wait for each other's writes.
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        # Total vector bytes, kept in the file (not per process) and updated in
+        # the same transaction as every insert and eviction
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) "
+            "SELECT 'bytes', COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        )
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for `texts`, with None for every miss."""
+        keys = [self.key(t) for t in texts]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    [self.model, *part],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                        [(now, self.model, h) for h in found],
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+
+        result = []
+        for k in keys:
+            blob = found.get(k)
+            result.append(array("f", blob).tolist() if blob is not None else None)
+        return result
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (self.model, self.key(t), array("f", v).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                # All vectors of one model have the same size
+                added = (self._conn.total_changes - before) * len(rows[0][2])
+                self._add_bytes(added)
+                if self._bytes() > self.max_bytes:
+                    self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _bytes(self) -> int:
+        return self._conn.execute("SELECT value FROM meta WHERE key = 'bytes'").fetchone()[0]
+
+    def _add_bytes(self, delta: int):
+        self._conn.execute("UPDATE meta SET value = MAX(value + ?, 0) WHERE key = 'bytes'", (delta,))
+
+    def _evict(self):
+        """
+        Drop least recently used vectors until the cache is at 90% of its
+        budget. Runs inside the caller's write transaction.
+        """
+        target = int(self.max_bytes * 0.9)
+        total = self._bytes()
+        while total > target:
+            rows = self._conn.execute(
+                "SELECT model, hash, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._add_bytes(-total)
+                break
+            doomed, freed = [], 0
+            for model, h, size in rows:
+                doomed.append((model, h))
+                freed += size
+                if total - freed <= target:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND hash = ?", doomed)
+            self._add_bytes(-freed)
+            total -= freed
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache, or None when disabled (EMBEDDING_CACHE_MAX_MB=0)."""
+    global _cache
+    if settings.EMBEDDING_CACHE_MAX_MB <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
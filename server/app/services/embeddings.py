@@ -0,0 +1,280 @@
+"""
+Shared embedding model.
+
+Loading the sentence-transformers model takes seconds, so it is created once
+per process and handed to every ingest and search path through
+`get_embeddings()`. `warm_up()` is called from the FastAPI lifespan so the
+first request does not pay the load latency.
+
+Search paths embed their query through `embed_query()`, which keeps an LRU
+of recently asked queries so repeated questions skip the forward pass.
+
+Bulk ingestion goes through `EmbeddingExecutor`, which can fan batches out
+to a pool of worker processes that each hold their own model instance.
+"""
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from ..core.config import settings
+
+_embeddings = None
+_lock = threading.Lock()
+
+
+def get_embeddings():
+    """Return the process-wide embedding model, loading it on first use."""
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                from langchain_community.embeddings import HuggingFaceEmbeddings
+                _embeddings = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
+    return _embeddings
+
+
+def warm_up():
+    """Load the model and run one forward pass so later calls are fast."""
+    get_embeddings().embed_query("warm up")
+
+
+# ---------------------------------------------------------------------------
+# Query embedding cache
+# ---------------------------------------------------------------------------
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU of query vectors keyed by (model, normalized query).
+    When `path` is set the entries are loaded from and saved to a JSON file so
+    the cache survives restarts.
+    """
+
+    def __init__(self, max_size: int, path: Optional[str] = None):
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def key(query: str) -> str:
+        return f"{settings.EMBEDDING_MODEL}|{' '.join(query.split())}"
+
+    def get(self, query: str) -> Optional[List[float]]:
+        key = self.key(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector: List[float]):
+        key = self.key(query)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+            with self._lock:
+                for key, vector in entries[-self.max_size:]:
+                    self._entries[key] = vector
+        except Exception as e:
+            print(f"Could not load query embedding cache: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Could not save query embedding cache: {e}")
+
+
+_query_cache: Optional[QueryEmbeddingCache] = None
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    global _query_cache
+    if _query_cache is None:
+        with _lock:
+            if _query_cache is None:
+                path = settings.QUERY_CACHE_PATH
+                _query_cache = QueryEmbeddingCache(
+                    max_size=settings.QUERY_CACHE_SIZE,
+                    path=os.path.join(os.getcwd(), path) if path else None,
+                )
+    return _query_cache
+
+
+def embed_query(query: str) -> List[float]:
+    """Embed a search query, reusing the vector of a previously seen query."""
+    cache = get_query_cache()
+    vector = cache.get(query)
+    if vector is None:
+        vector = get_embeddings().embed_query(query)
+        cache.put(query, vector)
+    return vector
+
+
+def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Embed several queries, running every cache miss in one batched forward pass."""
+    cache = get_query_cache()
+    vectors = [cache.get(q) for q in queries]
+    misses = [i for i, v in enumerate(vectors) if v is None]
+    if misses:
+        embedded = get_embeddings().embed_documents([queries[i] for i in misses])
+        for i, vector in zip(misses, embedded):
+            vectors[i] = vector
+            cache.put(queries[i], vector)
+    return vectors
+
+
+async def aembed_queries(queries: List[str]) -> List[List[float]]:
+    """`embed_queries` for async callers."""
+    import asyncio
+
+    return await asyncio.to_thread(embed_queries, queries)
+
+
+async def aembed_query(query: str) -> List[float]:
+    """`embed_query` for async callers: cache hits return at once, misses run in a thread."""
+    import asyncio
+
+    vector = get_query_cache().get(query)
+    if vector is None:
+        vector = await asyncio.to_thread(get_embeddings().embed_query, query)
+        get_query_cache().put(query, vector)
+    return vector
+
+
+# ---------------------------------------------------------------------------
+# Multi-process embedding for large ingests
+# ---------------------------------------------------------------------------
+
+_worker_embeddings = None
+
+
+def _init_worker(model_name: str, threads: int):
+    """Process pool initializer: load one model instance per worker."""
+    global _worker_embeddings
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+class EmbeddingExecutor:
+    """
+    Embeds batches of documents on a pool of worker processes.
+
+    `workers` defaults to `settings.EMBEDDING_WORKERS` (0 means one per CPU
+    core). With a single worker no pool is started and the shared in-process
+    model is used instead.
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: Optional[int] = None):
+        workers = settings.EMBEDDING_WORKERS if workers is None else workers
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self._pool = None
+        if self.workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.EMBEDDING_MODEL, threads),
+            )
+
+    def map(self, text_batches: Iterable[List[str]]) -> Iterator[List[List[float]]]:
+        """Embed each batch of texts, yielding vectors in input order."""
+        if self._pool is None:
+            embeddings = get_embeddings()
+            for texts in text_batches:
+                yield embeddings.embed_documents(texts) if texts else []
+            return
+
+        # Keep every worker busy without queueing the whole repository
+        pending = deque()
+        for texts in text_batches:
+            if not texts:
+                done = Future()
+                done.set_result([])
+                pending.append(done)
+                continue
+            pending.append(self._pool.submit(_embed_in_worker, texts))
+            if len(pending) >= self.workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+_executor = None
+
+
+def get_embedding_executor() -> EmbeddingExecutor:
+    """Return the process-wide executor used by API-triggered ingests."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = EmbeddingExecutor()
+    return _executor
+
+
+def shutdown():
+    """Stop the ingest worker pool and persist the query cache."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+    if _query_cache is not None:
+        _query_cache.save()
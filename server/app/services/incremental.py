@@ -0,0 +1,161 @@
+"""
+Incremental re-ingestion helpers.
+
+Works out which files of an already indexed repository actually need to be
+re-embedded. The previously indexed commit is diffed against the new HEAD to
+narrow down the candidate files, and SHA-256 content hashes stored in the
+`indexed_files` table are used to skip files whose content did not change.
+"""
+import hashlib
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+SUPPORTED_EXTENSIONS = (
+    ".py", ".js", ".ts", ".jsx", ".tsx", ".md", ".txt",
+    ".java", ".go", ".rs", ".c", ".cpp", ".h",
+)
+
+
+class IngestPlan:
+    """What an ingest run has to do for a repository."""
+
+    def __init__(self, mode: str, files: Dict[str, str], removed: List[str], unchanged: int = 0):
+        self.mode = mode            # "full" or "incremental"
+        self.files = files          # relative path -> content hash, to (re-)embed
+        self.removed = removed      # relative paths whose vectors must be dropped
+        self.unchanged = unchanged  # files skipped because their hash matched
+
+    @property
+    def is_noop(self) -> bool:
+        return self.mode == "incremental" and not self.files and not self.removed
+
+
+def is_supported(path: str) -> bool:
+    return path.endswith(SUPPORTED_EXTENSIONS)
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hash_bytes(f.read())
+    except OSError:
+        return None
+
+
+def chunk_id_prefix(repo_name: str, rel_path: str) -> str:
+    """Prefix shared by every vector id of one file, used for deletes."""
+    return f"{repo_name}#{rel_path}#"
+
+
+def chunk_id(repo_name: str, rel_path: str, i: int) -> str:
+    return f"{chunk_id_prefix(repo_name, rel_path)}{i}"
+
+
+def list_source_files(repo_dir: str) -> List[str]:
+    """All supported files in the working tree, as '/'-separated relative paths."""
+    paths = []
+    for root, _, files in os.walk(repo_dir):
+        if ".git" in root:
+            continue
+        for file in files:
+            if is_supported(file):
+                rel = os.path.relpath(os.path.join(root, file), repo_dir)
+                paths.append(rel.replace(os.sep, "/"))
+    return paths
+
+
+def diff_paths(repo, old_commit: str, new_commit: str) -> Optional[Tuple[Set[str], Set[str]]]:
+    """
+    Diff two commits of a GitPython `Repo`.
+    Returns (changed, removed) relative paths, or None when the diff cannot be
+    computed (e.g. the old commit vanished after a force-push).
+    """
+    try:
+        old = repo.commit(old_commit)
+        new = repo.commit(new_commit)
+        diffs = old.diff(new)
+    except Exception:
+        return None
+
+    changed: Set[str] = set()
+    removed: Set[str] = set()
+    for d in diffs:
+        if d.change_type == "D":
+            removed.add(d.a_path)
+        elif d.change_type == "R":
+            removed.add(d.a_path)
+            changed.add(d.b_path)
+        else:
+            changed.add(d.b_path)
+    return changed, removed
+
+
+def plan_ingest(
+    repo,
+    repo_dir: str,
+    head_commit: str,
+    previous_commit: Optional[str] = None,
+    known_hashes: Optional[Dict[str, str]] = None,
+) -> IngestPlan:
+    """
+    Decide between a full and an incremental ingest.
+
+    Incremental mode is used when there is a previously indexed commit to diff
+    against, or stored file hashes to compare with. Otherwise every supported
+    file is (re-)embedded.
+    """
+    known_hashes = known_hashes or {}
+    current = list_source_files(repo_dir)
+
+    diff = None
+    if previous_commit:
+        if previous_commit == head_commit:
+            diff = (set(), set())
+        else:
+            diff = diff_paths(repo, previous_commit, head_commit)
+
+    if diff is None and not known_hashes:
+        files = {}
+        for rel in current:
+            digest = hash_file(os.path.join(repo_dir, rel))
+            if digest:
+                files[rel] = digest
+        return IngestPlan("full", files, removed=[])
+
+    if diff is not None:
+        changed, removed = diff
+        current_set = set(current)
+        candidates = [p for p in changed if p in current_set]
+        removed = {p for p in removed if is_supported(p) and p not in current_set}
+    else:
+        # No usable commit history: compare every file against stored hashes
+        candidates = current
+        removed = set(known_hashes) - set(current)
+
+    files = {}
+    unchanged = 0
+    for rel in candidates:
+        digest = hash_file(os.path.join(repo_dir, rel))
+        if not digest:
+            continue
+        if known_hashes.get(rel) == digest:
+            unchanged += 1
+            continue
+        files[rel] = digest
+
+    if diff is not None:
+        unchanged += len(current) - len(candidates)
+
+    return IngestPlan("incremental", files, removed=sorted(removed), unchanged=unchanged)
+
+
+def delete_file_vectors(store, namespace: str, repo_name: str, rel_paths: List[str]) -> int:
+    """Delete every vector belonging to the given files from a vector store namespace."""
+    deleted = 0
+    for rel in rel_paths:
+        deleted += store.delete_prefix(chunk_id_prefix(repo_name, rel), namespace)
+    return deleted
@@ -0,0 +1,125 @@
+"""
+Push-based ingest progress.
+
+Ingest workers write each step (stage, progress, pipeline counters, ETA) to
+the repository registry. Instead of every client polling `/api/repos`, one
+watcher thread in the API process reads the registry's in-memory copy every
+WATCH_INTERVAL seconds while anyone is subscribed, and pushes the changed
+progress of the watched repositories to their subscribers (the SSE endpoint
+and the `ingest_repository_stream` MCP tool).
+
+Events are {"type": "progress" | "done" | "error", "repo_id", "status",
+"stage", "progress", "message", "stats"}; a stream ends after its "done" or
+"error" event.
+"""
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..core.repo_registry import get_repo_registry
+
+WATCH_INTERVAL = 0.5
+KEEPALIVE_SECONDS = 15
+
+
+def progress_event(repo_id: str, repo: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Progress event for a registry record (None when the repository is gone)."""
+    if repo is None:
+        return {"type": "error", "repo_id": repo_id, "status": "Deleted", "message": "Repository not found"}
+    status = repo.get("status")
+    return {
+        "type": "done" if status == "Indexed" else "error" if status == "Error" else "progress",
+        "repo_id": repo_id,
+        "status": status,
+        "stage": repo.get("stage"),
+        "progress": repo.get("progress", 0),
+        "message": repo.get("status_message", ""),
+        "stats": repo.get("ingest_stats"),
+    }
+
+
+class IngestProgressHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+
+    def _watch(self):
+        registry = get_repo_registry()
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    self._last.clear()
+                    return
+                watched = {rid: list(subs) for rid, subs in self._subscribers.items()}
+
+            repos = {repo["id"]: repo for repo in registry.all()}
+            for rid, subs in watched.items():
+                event = progress_event(rid, repos.get(rid))
+                with self._lock:
+                    if self._last.get(rid) == event:
+                        continue
+                    self._last[rid] = event
+                for loop, queue in subs:
+                    try:
+                        loop.call_soon_threadsafe(queue.put_nowait, event)
+                    except RuntimeError:
+                        pass  # The subscriber's event loop has closed
+
+            self._wake.wait(WATCH_INTERVAL)
+            self._wake.clear()
+
+    async def subscribe(self, repo_id: str, keepalive: float = KEEPALIVE_SECONDS) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Progress events of one repository, starting with its current state and
+        ending with "done" or "error". Yields None after `keepalive` seconds
+        without an event, so transports can keep the connection open.
+        """
+        event = progress_event(repo_id, get_repo_registry().get(repo_id))
+        yield event
+        if event["type"] != "progress":
+            return
+
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(repo_id, []).append(entry)
+            self._last.setdefault(repo_id, event)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name="ingest-progress", daemon=True)
+                self._thread.start()
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(entry[1].get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event["type"] != "progress":
+                    return
+        finally:
+            with self._lock:
+                subs = self._subscribers.get(repo_id, [])
+                if entry in subs:
+                    subs.remove(entry)
+                if not subs:
+                    self._subscribers.pop(repo_id, None)
+                    self._last.pop(repo_id, None)
+            self._wake.set()
+
+
+_hub: Optional[IngestProgressHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_progress_hub() -> IngestProgressHub:
+    """Process-wide progress hub."""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = IngestProgressHub()
+    return _hub
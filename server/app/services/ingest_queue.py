@@ -0,0 +1,481 @@
+"""
+Durable ingestion job queue.
+
+`/api/ingest` and the `ingest_repository` MCP tool enqueue a job instead of
+running the ingest inside the API process. Jobs are rows in a SQLite file
+(`settings.INGEST_QUEUE_PATH`, WAL mode) and are executed by a pool of
+`settings.INGEST_WORKERS` separate processes, so a burst of ingests cannot
+starve chat requests of CPU or of the event loop.
+
+- Job states: queued -> running -> succeeded | failed | cancelled.
+  Deleting a repository cancels its jobs; a running ingest notices at its
+  next stage and its partial vectors and keyword index are removed, unless
+  the repository has been queued for ingest again in the meantime.
+- Per-repository locking: a partial unique index allows at most one queued
+  or running job per repository; enqueueing again returns the active job.
+  A cancelled job keeps its worker until it has actually stopped, and no
+  other job of its repository is claimed before then, so two workers never
+  share a repository's clone directory.
+- Retries: a failed attempt is queued again after an exponential backoff,
+  up to `settings.INGEST_MAX_ATTEMPTS` attempts.
+- A running job's worker heartbeats every few seconds; a job whose
+  heartbeat is older than LEASE_SECONDS (its worker died) is reclaimed.
+  A worker crash uses up the attempt; only jobs interrupted by a graceful
+  shutdown are requeued for free.
+"""
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from ..core.config import settings
+
+LEASE_SECONDS = 120
+HEARTBEAT_SECONDS = 10
+POLL_SECONDS = 1.0
+RETRY_BACKOFF_SECONDS = 30
+
+
+def _row(cursor, row) -> Dict[str, Any]:
+    job = {col[0]: value for col, value in zip(cursor.description, row)}
+    if "incremental" in job:
+        job["incremental"] = bool(job["incremental"])
+    return job
+
+
+class IngestQueue:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(os.getcwd(), settings.INGEST_QUEUE_PATH)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = _row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                repo_id TEXT NOT NULL,
+                repo_url TEXT NOT NULL,
+                incremental INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                error TEXT,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                run_after REAL NOT NULL,
+                started_at REAL,
+                heartbeat_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        # One active job per repository
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_active_repo ON jobs (repo_id) "
+            "WHERE state IN ('queued', 'running')"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_state ON jobs (state, run_after)")
+
+    def _transaction(self, work):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work()
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ---- Producer side ----
+
+    def enqueue(self, repo_id: str, repo_url: str, incremental: bool = True) -> Dict[str, Any]:
+        """
+        Queue an ingest of `repo_id`. Returns the job, with "created" False
+        when the repository already had a queued or running job.
+        """
+        def work():
+            active = self._active(repo_id)
+            if active:
+                return {**active, "created": False}
+            now = time.time()
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, repo_id, repo_url, incremental, state, max_attempts, created_at, run_after) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, repo_id, repo_url, int(incremental), max(1, settings.INGEST_MAX_ATTEMPTS), now, now),
+            )
+            return {**self._get(job_id), "created": True}
+
+        return self._transaction(work)
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def _active(self, repo_id: str) -> Optional[Dict[str, Any]]:
+        return self._conn.execute(
+            "SELECT * FROM jobs WHERE repo_id = ? AND state IN ('queued', 'running')", (repo_id,)
+        ).fetchone()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._get(job_id)
+
+    def active(self, repo_id: str) -> Optional[Dict[str, Any]]:
+        """The repository's queued or running job, if any."""
+        with self._lock:
+            return self._active(repo_id)
+
+    def jobs(self, repo_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first."""
+        with self._lock:
+            if repo_id:
+                return self._conn.execute(
+                    "SELECT * FROM jobs WHERE repo_id = ? ORDER BY created_at DESC LIMIT ?", (repo_id, limit)
+                ).fetchall()
+            return self._conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+
+    def cancel(self, repo_id: Optional[str] = None) -> int:
+        """
+        Cancel the queued and running jobs of a repository, or of all
+        repositories. A running job stops at its next cancellation check.
+        """
+        with self._lock:
+            sql = "UPDATE jobs SET state = 'cancelled', finished_at = ? WHERE state IN ('queued', 'running')"
+            params = [time.time()]
+            if repo_id:
+                sql += " AND repo_id = ?"
+                params.append(repo_id)
+            return self._conn.execute(sql, params).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        return {row["state"]: row["n"] for row in rows}
+
+    # ---- Worker side ----
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Mark the oldest runnable job as running for `worker` and return it."""
+        def work():
+            now = time.time()
+            self._reclaim_expired(now)
+            # Skip repositories whose cancelled job is still winding down
+            job = self._conn.execute(
+                "SELECT * FROM jobs WHERE state = 'queued' AND run_after <= ? AND NOT EXISTS ("
+                "SELECT 1 FROM jobs AS c WHERE c.repo_id = jobs.repo_id AND c.state = 'cancelled' "
+                "AND c.worker IS NOT NULL AND c.heartbeat_at >= ?"
+                ") ORDER BY created_at LIMIT 1",
+                (now, now - LEASE_SECONDS),
+            ).fetchone()
+            if job is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, worker = ?, "
+                "started_at = ?, heartbeat_at = ?, error = NULL WHERE id = ?",
+                (worker, now, now, job["id"]),
+            )
+            return self._get(job["id"])
+
+        return self._transaction(work)
+
+    def _reclaim_expired(self, now: float):
+        """Requeue (or fail, when out of attempts) running jobs whose worker stopped heartbeating."""
+        expired = self._conn.execute(
+            "SELECT * FROM jobs WHERE state = 'running' AND heartbeat_at < ?", (now - LEASE_SECONDS,)
+        ).fetchall()
+        for job in expired:
+            self._finish_attempt(job, "Ingest worker stopped responding", retry=True, now=now)
+
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or row["state"] == "cancelled"
+
+    def heartbeat(self, job_id: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state IN ('running', 'cancelled')",
+                (time.time(), job_id),
+            )
+
+    def detach(self, job_id: str):
+        """Mark a cancelled job's worker as done with it, unblocking its repository."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET worker = NULL WHERE id = ? AND state = 'cancelled'", (job_id,))
+
+    def if_latest(self, job: Dict[str, Any], work: Callable[[], None]) -> bool:
+        """
+        Run `work()` unless another job of `job`'s repository is queued or
+        running. The check and `work()` share one write transaction, so no
+        job can be enqueued in between. Returns True when `work()` ran.
+        """
+        def txn():
+            newer = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE repo_id = ? AND id != ? AND state IN ('queued', 'running')",
+                (job["repo_id"], job["id"]),
+            ).fetchone()
+            if newer:
+                return False
+            work()
+            return True
+
+        return self._transaction(txn)
+
+    def complete(self, job_id: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'succeeded', finished_at = ?, error = NULL WHERE id = ? AND state = 'running'",
+                (time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str, retry: bool = True) -> Optional[Dict[str, Any]]:
+        """Record a failed attempt. Returns the job, queued again when it will be retried."""
+        def work():
+            job = self._get(job_id)
+            if job is None or job["state"] != "running":
+                return job
+            self._finish_attempt(job, error, retry=retry, now=time.time())
+            return self._get(job_id)
+
+        return self._transaction(work)
+
+    def _finish_attempt(self, job: Dict[str, Any], error: str, retry: bool, now: float):
+        if retry and job["attempts"] < job["max_attempts"]:
+            delay = RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)
+            self._conn.execute(
+                "UPDATE jobs SET state = 'queued', error = ?, worker = NULL, run_after = ? WHERE id = ?",
+                (error, now + delay, job["id"]),
+            )
+        else:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (error, now, job["id"]),
+            )
+
+    def crashed(self, workers: List[str], error: str = "Ingest worker exited") -> List[Dict[str, Any]]:
+        """
+        Record a failed attempt for the running jobs of workers that died, so a
+        job that keeps killing its worker still runs out of attempts. Returns
+        the jobs, queued again or failed.
+        """
+        if not workers:
+            return []
+
+        def work():
+            now = time.time()
+            jobs = self._conn.execute(
+                f"SELECT * FROM jobs WHERE state = 'running' AND worker IN ({','.join('?' * len(workers))})",
+                workers,
+            ).fetchall()
+            for job in jobs:
+                self._finish_attempt(job, error, retry=True, now=now)
+            self._detach_workers(workers)
+            return [self._get(job["id"]) for job in jobs]
+
+        return self._transaction(work)
+
+    def release(self, workers: List[str]):
+        """Requeue the running jobs of workers that were stopped, without using up an attempt."""
+        if not workers:
+            return
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'queued', attempts = MAX(attempts - 1, 0), worker = NULL, run_after = ? "
+                f"WHERE state = 'running' AND worker IN ({','.join('?' * len(workers))})",
+                [time.time(), *workers],
+            )
+            self._detach_workers(workers)
+
+    def _detach_workers(self, workers: List[str]):
+        """Unblock the repositories of cancelled jobs whose workers are gone."""
+        self._conn.execute(
+            f"UPDATE jobs SET worker = NULL WHERE state = 'cancelled' AND worker IN ({','.join('?' * len(workers))})",
+            workers,
+        )
+
+
+_queue: Optional[IngestQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_ingest_queue() -> IngestQueue:
+    """Process-wide queue handle."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = IngestQueue()
+    return _queue
+
+
+# ---------------------------------------------------------------------------
+# Worker processes
+# ---------------------------------------------------------------------------
+
+
+def _run_job(queue: IngestQueue, job: Dict[str, Any]):
+    from ..core.repo_registry import get_repo_registry
+    from .repo_ingest import IngestCancelled, IngestError, run_ingest
+
+    registry = get_repo_registry()
+    repo_id = job["repo_id"]
+    print(f"Ingest job {job['id']} started: {repo_id} (attempt {job['attempts']}/{job['max_attempts']})")
+
+    done = threading.Event()
+
+    def beat():
+        while not done.wait(HEARTBEAT_SECONDS):
+            queue.heartbeat(job["id"])
+
+    beater = threading.Thread(target=beat, daemon=True)
+    beater.start()
+
+    def cancelled(error: str):
+        # The repository is being (or has been) deleted: remove anything this
+        # job wrote after delete_repository cleared the namespace, unless the
+        # repository was added or ingested again and a new job owns it now
+        print(f"Ingest job {job['id']} cancelled: {repo_id}")
+
+        def clean_up():
+            _drop_results(repo_id)
+            _mark_failed(repo_id, error)
+
+        if not queue.if_latest(job, clean_up):
+            print(f"Skipped cleanup of cancelled job {job['id']}: {repo_id} has a newer job")
+
+    try:
+        run_ingest(repo_id, job["repo_url"], job["incremental"], cancelled=lambda: queue.is_cancelled(job["id"]))
+        queue.complete(job["id"])
+        print(f"Ingest job {job['id']} succeeded: {repo_id}")
+    except IngestCancelled as e:
+        cancelled(str(e))
+    except Exception as e:
+        print(f"Error ingesting repository: {e}")
+        failed = queue.fail(job["id"], str(e), retry=not isinstance(e, IngestError))
+        if failed and failed["state"] == "cancelled":
+            cancelled(str(e))
+        elif failed and failed["state"] == "queued":
+            registry.update(
+                repo_id,
+                stage="retrying",
+                status_message=(
+                    f"Attempt {failed['attempts']}/{failed['max_attempts']} failed: {e}. "
+                    f"Retrying in {int(failed['run_after'] - time.time())}s..."
+                ),
+            )
+        else:
+            _mark_failed(repo_id, str(e))
+    finally:
+        done.set()
+        queue.detach(job["id"])
+
+
+def _worker_main(worker: str, stop):
+    """Entry point of an ingest worker process."""
+    from .embeddings import shutdown as shutdown_embeddings
+
+    queue = IngestQueue()
+    print(f"Ingest worker {worker} started (pid {os.getpid()})")
+    try:
+        while not stop.is_set():
+            job = queue.claim(worker)
+            if job is None:
+                stop.wait(POLL_SECONDS)
+                continue
+            _run_job(queue, job)
+    finally:
+        shutdown_embeddings()
+
+
+def _drop_results(repo_id: str):
+    """Remove what a cancelled ingest wrote for a repository that was deleted meanwhile."""
+    from . import bm25_index
+    from .vector_store import get_vector_store
+
+    try:
+        get_vector_store().delete_namespace(repo_id)
+        bm25_index.delete_index(repo_id)
+    except Exception as e:
+        print(f"Could not clean up cancelled ingest of {repo_id}: {e}")
+
+
+def _mark_failed(repo_id: str, error: str):
+    from datetime import datetime
+    from ..core.repo_registry import get_repo_registry
+
+    get_repo_registry().update(
+        repo_id,
+        status="Error",
+        stage="error",
+        status_message=f"Error: {error}",
+        lastSynced=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+
+class IngestWorkerPool:
+    """`settings.INGEST_WORKERS` worker processes, restarted if they die."""
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = max(1, settings.INGEST_WORKERS if size is None else size)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._procs: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _name(self, i: int) -> str:
+        return f"ingest-{os.getpid()}-{i}"
+
+    def ensure_running(self):
+        """Start missing or dead workers."""
+        with self._lock:
+            if self._stop.is_set():
+                return
+            dead = [name for name, proc in self._procs.items() if not proc.is_alive()]
+            if dead:
+                # A crashed worker's job would otherwise wait for its lease to expire
+                for job in get_ingest_queue().crashed(dead):
+                    if job["state"] == "failed":
+                        _mark_failed(job["repo_id"], job["error"])
+            for i in range(self.size):
+                name = self._name(i)
+                proc = self._procs.get(name)
+                if proc is None or not proc.is_alive():
+                    # Not a daemon: workers start their own embedding processes
+                    proc = self._ctx.Process(target=_worker_main, args=(name, self._stop), name=name)
+                    proc.start()
+                    self._procs[name] = proc
+
+    def stop(self, timeout: float = 10):
+        with self._lock:
+            self._stop.set()
+            for proc in self._procs.values():
+                proc.join(timeout)
+                if proc.is_alive():
+                    proc.terminate()
+                    proc.join(timeout)
+            get_ingest_queue().release(list(self._procs))
+            self._procs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            alive = sum(proc.is_alive() for proc in self._procs.values())
+        return {"workers": self.size, "alive": alive, "jobs": get_ingest_queue().counts()}
+
+
+_pool: Optional[IngestWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> IngestWorkerPool:
+    """Process-wide worker pool (not started until `ensure_running`)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = IngestWorkerPool()
+    return _pool
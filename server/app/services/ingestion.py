@@ -1,88 +1,285 @@
 from git import Repo
 import os
+import queue
 import shutil
-from typing import List, Dict, Any
-from langchain_community.document_loaders import DirectoryLoader, TextLoader, UnstructuredFileLoader
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pinecone import Pinecone, ServerlessSpec
-from ..core.config import settings
+import threading
+from collections import deque
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional
+from . import bm25_index
+from .chunking import chunk_file
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .embeddings import EmbeddingExecutor, get_embedding_executor
+from .incremental import chunk_id, list_source_files
+from .trigram_index import build_index
+from .vector_store import VectorStore, get_vector_store
 import time
 
+
+# ---------------------------------------------------------------------------
+# Streaming pipeline: walk → read → split → embed batch → upsert batch
+#
+# Every stage is a generator, and the read/split and embed stages run in their
+# own threads connected by bounded queues. Peak memory is proportional to
+# batch_size * queue_size rather than to the size of the repository, and the
+# first upsert happens while later files are still being read.
+# ---------------------------------------------------------------------------
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def prefetch(items: Iterable, maxsize: int = 4) -> Iterator:
+    """Run `items` in a background thread, buffering at most `maxsize` results."""
+    q: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_StageError(e))
+
+    threading.Thread(target=worker, daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_documents(repo_dir: str, rel_paths: Iterable[str], repo_name: str) -> Iterator[Dict[str, str]]:
+    """Yield one document per readable UTF-8 file."""
+    for rel_path in rel_paths:
+        path = os.path.join(repo_dir, rel_path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except Exception:
+            continue
+        yield {"text": text, "source": path, "path": rel_path, "repo": repo_name}
+
+
+def split_documents(documents: Iterable[Dict[str, str]], chunker=None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the chunks of each document as soon as it has been split.
+    `chunker(path, text)` returns [{"text", "start_line", "end_line"}]
+    and defaults to the code-aware `chunking.chunk_file`.
+    """
+    chunker = chunker or chunk_file
+    for d in documents:
+        for i, c in enumerate(chunker(d["path"], d["text"])):
+            yield {
+                "id": chunk_id(d["repo"], d["path"], i),
+                "text": c["text"],
+                "source": d["source"],
+                "repo": d["repo"],
+                "start_line": c["start_line"],
+                "end_line": c["end_line"],
+            }
+
+
+def embed_batches(
+    batches: Iterable[List[Dict[str, str]]],
+    executor: EmbeddingExecutor,
+    cache: Optional[EmbeddingCache] = None,
+    stats: Optional[Dict[str, Any]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Embed each chunk batch and yield it as Pinecone-ready vectors.
+    Chunks found in `cache` are not sent to the executor.
+    """
+    pending = deque()
+
+    def misses():
+        for batch in batches:
+            texts = [c["text"] for c in batch]
+            cached = cache.get_many(texts) if cache else [None] * len(texts)
+            missing = [t for t, v in zip(texts, cached) if v is None]
+            if stats is not None:
+                stats["cache_hits"] += len(texts) - len(missing)
+                stats["cache_misses"] += len(missing)
+            pending.append((batch, cached, missing))
+            yield missing
+
+    # executor.map preserves order, so results line up with `pending`
+    for computed in executor.map(misses()):
+        batch, cached, missing = pending.popleft()
+        if cache:
+            cache.put_many(missing, computed)
+        fresh = iter(computed)
+        values = [v if v is not None else next(fresh) for v in cached]
+        yield [
+            {
+                "id": c["id"],
+                "values": v,
+                "metadata": {
+                    "text": c["text"], "source": c["source"], "repo": c["repo"],
+                    "start_line": c["start_line"], "end_line": c["end_line"],
+                },
+            }
+            for c, v in zip(batch, values)
+        ]
+
+
+def build_lexical_index(namespace: str, repo_dir: str, repo_name: str, chunker=None) -> Dict[str, Any]:
+    """
+    Rebuild the BM25 index of a namespace over every source file, chunked
+    exactly like the embedded chunks so both indexes share chunk ids.
+    """
+    docs = read_documents(repo_dir, list_source_files(repo_dir), repo_name)
+    return bm25_index.build_index(namespace, split_documents(docs, chunker))
+
+
+def update_lexical_index(
+    namespace: str, repo_dir: str, repo_name: str,
+    rel_paths: List[str], removed: List[str], chunker=None,
+) -> Dict[str, Any]:
+    """
+    Re-index only the modified (`rel_paths`) and removed files of a namespace
+    in its BM25 index, or build the whole index if it does not exist yet.
+    """
+    docs = read_documents(repo_dir, rel_paths, repo_name)
+    stale = [os.path.join(repo_dir, p) for p in list(rel_paths) + list(removed)]
+    stats = bm25_index.update_index(namespace, split_documents(docs, chunker), stale)
+    if stats is None:
+        stats = build_lexical_index(namespace, repo_dir, repo_name, chunker)
+    return stats
+
+
+def run_pipeline(
+    repo_dir: str,
+    rel_paths: List[str],
+    repo_name: str,
+    upsert: Callable[[List[Dict[str, Any]]], None],
+    executor: Optional[EmbeddingExecutor] = None,
+    chunker=None,
+    batch_size: Optional[int] = None,
+    queue_size: int = 4,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Stream `rel_paths` through read → split → embed → `upsert`.
+
+    `on_progress` is called after every upserted batch with running totals
+    (`files`, `total_files`, `chunks`, `batches`, `chunks_per_sec`,
+    `cache_hits`, `cache_misses`, `cache_hit_ratio`).
+    """
+    executor = executor or get_embedding_executor()
+    batch_size = batch_size or executor.batch_size
+    stats = {
+        "files": 0, "total_files": len(rel_paths), "chunks": 0, "batches": 0,
+        "chunks_per_sec": 0.0, "cache_hits": 0, "cache_misses": 0, "cache_hit_ratio": 0.0,
+        "seconds": 0.0, "eta_seconds": None,
+    }
+    started = time.monotonic()
+
+    def counted(docs):
+        for d in docs:
+            stats["files"] += 1
+            yield d
+
+    docs = counted(read_documents(repo_dir, rel_paths, repo_name))
+    chunk_batches = prefetch(batched(split_documents(docs, chunker), batch_size), queue_size)
+    vector_batches = prefetch(
+        embed_batches(chunk_batches, executor, cache=get_embedding_cache(), stats=stats),
+        queue_size,
+    )
+
+    for vectors in vector_batches:
+        upsert(vectors)
+        stats["chunks"] += len(vectors)
+        stats["batches"] += 1
+        stats["seconds"] = time.monotonic() - started
+        stats["chunks_per_sec"] = stats["chunks"] / max(stats["seconds"], 1e-6)
+        if stats["files"]:
+            # Files are counted as they are read, slightly ahead of the upserts
+            stats["eta_seconds"] = stats["seconds"] / stats["files"] * (stats["total_files"] - stats["files"])
+        stats["cache_hit_ratio"] = stats["cache_hits"] / max(stats["cache_hits"] + stats["cache_misses"], 1)
+        if on_progress:
+            on_progress(stats)
+
+    return stats
+
+
 class IngestionService:
-    def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        self.index_name = settings.PINECONE_INDEX
+    def __init__(self, executor: Optional[EmbeddingExecutor] = None, store: Optional[VectorStore] = None):
+        self.executor = executor or get_embedding_executor()
+        self.store = store or get_vector_store()
 
     def clone_repo(self, repo_url: str, repo_path: str) -> str:
         if os.path.exists(repo_path):
             shutil.rmtree(repo_path)  # Clean up existing
-        
+
         Repo.clone_from(repo_url, repo_path)
         return repo_path
 
     def process_repo(self, repo_url: str):
         repo_name = repo_url.split("/")[-1].replace(".git", "")
+        repo_id = repo_name.lower().replace(" ", "-").replace("_", "-")
         repo_path = os.path.join(os.getcwd(), "repos", repo_name)
-        
+
         print(f"Cloning {repo_url} to {repo_path}...")
         self.clone_repo(repo_url, repo_path)
-        
-        print("Loading documents...")
-        # Basic text loader for code files
-        loader = DirectoryLoader(repo_path, glob="**/*.*", show_progress=True, use_multithreading=True, loader_cls=TextLoader, loader_kwargs={'autodetect_encoding': True})
-        docs = loader.load()
-        
-        print(f"Loaded {len(docs)} documents. Splitting...")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            add_start_index=True
+
+        files = list_source_files(repo_path)
+        print(f"Found {len(files)} source files.")
+
+        grep_stats = build_index(repo_path)
+        print(f"Built search index over {grep_stats['files']} files in {grep_stats['seconds']}s.")
+
+        try:
+            self.store.ensure_index(dimension=384)  # all-MiniLM-L6-v2 dimension
+        except Exception as e:
+            print(f"Failed to create index: {e}")
+            return
+
+        print("Creating embeddings and upserting vectors...")
+        stats = run_pipeline(
+            repo_path, files, repo_name,
+            upsert=lambda vectors: self.store.upsert(vectors, namespace=repo_id),
+            executor=self.executor,
+            on_progress=lambda s: print(
+                f"Upserted batch {s['batches']} ({s['chunks']} chunks, "
+                f"{s['files']}/{s['total_files']} files, {s['chunks_per_sec']:.1f} chunks/sec, "
+                f"{s['cache_hit_ratio']:.0%} cache hits)"
+            ),
         )
-        splits = text_splitter.split_documents(docs)
-        print(f" created {len(splits)} chunks.")
-        
-        # Prepare vectors
-        print("Creating embeddings and upserting to Pinecone...")
-        
-        # Check if index exists
-        existing_indexes = [index.name for index in self.pc.list_indexes()]
-        if self.index_name not in existing_indexes:
-            print(f"Index {self.index_name} does not exist. Please create it first or use a serverless spec creation if needed.")
-            # Basic serverless spec creation for starter if allowed, otherwise fail
-            try:
-                self.pc.create_index(
-                    name=self.index_name,
-                    dimension=384, # all-MiniLM-L6-v2 dimension
-                    metric="cosine",
-                    spec=ServerlessSpec(
-                        cloud="aws",
-                        region="us-east-1"
-                    ) 
-                )
-                while not self.pc.describe_index(self.index_name).status['ready']:
-                    time.sleep(1)
-            except Exception as e:
-                print(f"Failed to create index: {e}")
-                return
+        self.store.flush(repo_id)
 
-        index = self.pc.Index(self.index_name)
-        
-        batch_size = 100
-        for i in range(0, len(splits), batch_size):
-            batch = splits[i:i+batch_size]
-            texts = [doc.page_content for doc in batch]
-            metadatas = [{"source": doc.metadata["source"], "repo": repo_name} for doc in batch]
-            ids = [f"{repo_name}-{i+j}" for j in range(len(batch))]
-            
-            # Embed
-            embeddings = self.embeddings.embed_documents(texts)
-            
-            # Upsert
-            vectors = zip(ids, embeddings, metadatas)
-            index.upsert(vectors=list(vectors))
-            print(f"Upserted batch {i} to {i+len(batch)}")
+        bm25_stats = build_lexical_index(repo_id, repo_path, repo_name)
+        print(f"Built BM25 index over {bm25_stats['chunks']} chunks in {bm25_stats['seconds']}s.")
 
         print("Ingestion complete.")
-        return {"status": "success", "chunks": len(splits)}
+        return {"status": "success", "chunks": stats["chunks"], "chunks_per_sec": stats["chunks_per_sec"]}
@@ -0,0 +1,133 @@
+"""
+Background reconciliation of the repository registry with the vector store.
+
+Listing the vector store's namespaces is a network call (Pinecone's
+`describe_index_stats`), so it is no longer made on every `/api/repos`
+request. A daemon thread calls `reconcile()` every
+`settings.NAMESPACE_SYNC_INTERVAL` seconds instead:
+
+- a namespace with no registry entry is added as an indexed repository;
+- an "Indexed" repository whose namespace is missing is removed, once it
+  has been missing on two consecutive passes (the vector store's stats can
+  lag behind a fresh upsert).
+
+Each pass fetches the namespace list afresh and caches it; `namespaces()`
+serves that cache until it is an interval old. Drift is corrected within
+about two intervals.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from ..core.config import settings
+from ..core.repo_registry import get_repo_registry
+
+
+class NamespaceSync:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._namespaces: Optional[Set[str]] = None
+        self._fetched_at = 0.0
+        self._missing: Set[str] = set()  # Indexed repos without a namespace on the last pass
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self.last_run: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def namespaces(self, max_age: Optional[float] = None) -> Set[str]:
+        """Namespaces of the vector store, fetched again once older than `max_age` seconds."""
+        from .vector_store import get_vector_store
+
+        max_age = settings.NAMESPACE_SYNC_INTERVAL if max_age is None else max_age
+        with self._lock:
+            if self._namespaces is None or time.monotonic() - self._fetched_at >= max_age:
+                self._namespaces = set(get_vector_store().list_namespaces())
+                self._fetched_at = time.monotonic()
+            return set(self._namespaces)
+
+    def reconcile(self) -> Dict[str, Any]:
+        """Apply the differences between the registry and the vector store."""
+        registry = get_repo_registry()
+        try:
+            active = self.namespaces(max_age=0)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Warning: Could not sync with vector store: {e}")
+            return {"error": str(e)}
+
+        added, removed = [], []
+        missing = {
+            repo["id"] for repo in registry.all()
+            if repo["status"] == "Indexed" and repo["id"] not in active
+        }
+        for rid in missing & self._missing:
+            if registry.delete(rid):
+                removed.append(rid)
+        self._missing = missing - set(removed)
+
+        for ns in active:
+            if registry.add({
+                "id": ns,
+                "name": ns.replace("-", " ").title(),
+                "url": f"https://github.com/unknown/{ns}",
+                "status": "Indexed",
+                "lastSynced": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "branch": "main",
+                "language": "Unknown",
+                "progress": 100,
+                "status_message": "Discovered in vector store",
+            }):
+                added.append(ns)
+
+        self.last_run = time.time()
+        self.last_error = None
+        if added or removed:
+            print(f"Namespace sync: added {added}, removed {removed}")
+        return {"added": added, "removed": removed, "namespaces": len(active)}
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.reconcile()
+            self._stop.wait(settings.NAMESPACE_SYNC_INTERVAL)
+
+    def start(self):
+        """Start the periodic reconciliation thread (no-op when NAMESPACE_SYNC_INTERVAL is 0)."""
+        if settings.NAMESPACE_SYNC_INTERVAL <= 0:
+            return
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="namespace-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._thread_lock:
+            if self._thread:
+                self._thread.join(timeout=5)
+                self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": settings.NAMESPACE_SYNC_INTERVAL,
+            "last_run": datetime.fromtimestamp(self.last_run).strftime("%Y-%m-%d %H:%M:%S") if self.last_run else None,
+            "last_error": self.last_error,
+            "pending_removal": sorted(self._missing),
+        }
+
+
+_sync: Optional[NamespaceSync] = None
+_sync_lock = threading.Lock()
+
+
+def get_namespace_sync() -> NamespaceSync:
+    """Process-wide namespace reconciler."""
+    global _sync
+    if _sync is None:
+        with _sync_lock:
+            if _sync is None:
+                _sync = NamespaceSync()
+    return _sync
@@ -0,0 +1,87 @@
+"""
+Local query router.
+
+Decides, without an LLM call, whether a question needs the planner. Most
+questions ("where is X defined?", "what does Y do?") are answered by
+searching for the question itself and a few local rewrites of it
+(`expand_query`); only questions that combine several parts of the codebase
+benefit from a plan whose steps are searched separately.
+`settings.PLANNER_MODE` can force the planner on ("always") or off ("never").
+"""
+import re
+from typing import List
+
+from ..core.config import settings
+
+MAX_PLAN_STEPS = 4
+MAX_SUB_QUERIES = 4
+
+# Whole words only: "flow" must not fire on "workflow", nor "trace" on "traceback"
+_MULTI_STEP_RE = re.compile(
+    r"\b(?:"
+    r"step by step|walk me through|end[ -]to[ -]end|from start to finish"
+    r"|compar(?:e|es|ed|ing|ison)|differences? between|relationship between"
+    r"|interact(?:s|ing|ions?)?|flows?|life ?cycles?|trace|tracing|pipelines?"
+    r"|architecture|refactor(?:ing)?|migrat(?:e|ing|ion)|implement(?:ing)?|design|across"
+    r"|all the places|everywhere|how would i|how (?:do|can) i add"
+    r"|and then|and also|as well as|versus|vs"
+    r")\b"
+)
+_IDENTIFIER_RE = re.compile(
+    r"`([^`]+)`"                                   # `quoted code`
+    r"|\b([\w./-]+\.(?:py|js|ts|jsx|tsx|go|java|rs|c|cpp|h|md))\b"  # file names
+    r"|\b([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+)\b"       # dotted.names
+    r"|\b([a-z]+[A-Z]\w*|[A-Z][a-z0-9]+[A-Z]\w*|[a-z0-9]+_[\w]+)\b"  # camelCase, PascalCase, snake_case
+)
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "how", "what",
+    "where", "when", "why", "which", "who", "can", "could", "should", "would", "i", "we",
+    "you", "me", "my", "our", "in", "on", "of", "to", "for", "with", "this", "that", "it",
+    "and", "or", "there", "please", "explain", "tell", "show", "about", "code", "codebase",
+}
+_STEP_RE = re.compile(r"^\s*(?:\d+[.)]|[-*•]|step\s+\d+:?)\s*(.+)$", re.IGNORECASE)
+
+
+def needs_plan(query: str) -> bool:
+    """True when the question should be broken into steps by the planner."""
+    mode = settings.PLANNER_MODE
+    if mode == "always":
+        return True
+    if mode == "never":
+        return False
+
+    q = query.lower()
+    if q.count("?") > 1 or _MULTI_STEP_RE.search(q):
+        return True
+    return len(q.split()) > 30
+
+
+def expand_query(query: str) -> List[str]:
+    """
+    Local sub-queries for a question: the question itself, its keywords
+    without question words, and every code identifier it mentions.
+    """
+    queries = [query]
+
+    keywords = [w for w in re.findall(r"[\w./-]+", query) if w.lower() not in _STOPWORDS]
+    if keywords and len(keywords) < len(query.split()):
+        queries.append(" ".join(keywords))
+
+    for match in _IDENTIFIER_RE.finditer(query):
+        identifier = next(g for g in match.groups() if g)
+        if identifier not in queries:
+            queries.append(identifier)
+
+    return queries[:MAX_SUB_QUERIES]
+
+
+def plan_steps(plan: str) -> List[str]:
+    """Numbered or bulleted steps of a planner reply, at most MAX_PLAN_STEPS."""
+    steps = []
+    for line in plan.splitlines():
+        match = _STEP_RE.match(line)
+        if match:
+            step = match.group(1).strip().strip("*").strip()
+            if step:
+                steps.append(step)
+    return steps[:MAX_PLAN_STEPS]
@@ -0,0 +1,240 @@
+"""
+Repository ingestion: clone or pull, plan the (incremental) update, embed
+and upload the changed files, and build the keyword and trigram indexes.
+`run_ingest` is executed by the ingest job queue's worker processes.
+"""
+import os
+from datetime import datetime
+from typing import Callable
+
+from ..core.database import SessionLocal
+from ..core.repo_registry import get_repo_registry
+
+
+class IngestError(Exception):
+    """An ingest failure that retrying will not fix."""
+
+
+class IngestCancelled(Exception):
+    """The ingest's job was cancelled or its repository deleted while it ran."""
+
+
+def _progress_stats(stats):
+    """Pipeline counters published with a repository's ingest progress."""
+    eta = stats.get("eta_seconds")
+    return {
+        "files": stats["files"],
+        "total_files": stats["total_files"],
+        "chunks": stats["chunks"],
+        "batches": stats["batches"],
+        "chunks_per_sec": round(stats["chunks_per_sec"], 1),
+        "cache_hit_ratio": round(stats["cache_hit_ratio"], 3),
+        "elapsed_seconds": round(stats.get("seconds", 0.0), 1),
+        "eta_seconds": round(eta) if eta is not None else None,
+    }
+
+
+def run_ingest(repo_id: str, repo_url: str, incremental: bool = True, cancelled: Callable[[], bool] = None):
+    """
+    Clone (or pull) and index a repository, writing status and progress to
+    the repository registry, one atomic update per step. Runs in an ingest
+    worker process; errors are raised for the job queue to retry.
+
+    With `incremental=True` a previously indexed repository only has its
+    added/modified files re-embedded and the vectors of removed files deleted.
+
+    `cancelled` is checked between stages; once it returns True, or the
+    repository is no longer in the registry, IngestCancelled is raised.
+    """
+    registry = get_repo_registry()
+
+    def update(**fields):
+        registry.update(repo_id, **fields)
+
+    def check_cancelled():
+        if (cancelled and cancelled()) or repo_id not in registry:
+            raise IngestCancelled(f"Ingest of '{repo_id}' was cancelled")
+
+    from git import Repo
+    import shutil
+    from ..crud import repositories as repo_crud
+    from . import incremental as incremental_svc
+    from . import bm25_index
+    from . import ingestion
+    from . import trigram_index
+    from .vector_store import get_vector_store
+
+    repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
+    base_dir = os.path.join(os.getcwd(), "repos")
+    repo_dir = os.path.join(base_dir, repo_name)
+    previous_commit = (registry.get(repo_id) or {}).get("commit") if incremental else None
+
+    # Clone / Pull
+    update(stage="cloning", progress=10, status_message=f"Ingesting repository: {repo_url}", ingest_stats=None)
+
+    if os.path.exists(repo_dir):
+        try:
+            update(status_message="Repository exists, pulling latest...")
+            repo = Repo(repo_dir)
+            repo.remotes.origin.pull()
+        except Exception:
+            update(status_message="Pull failed, re-cloning...")
+            import stat
+
+            def on_rm_error(func, path, exc_info):
+                os.chmod(path, stat.S_IWRITE)
+                func(path)
+
+            shutil.rmtree(repo_dir, onerror=on_rm_error)
+            Repo.clone_from(repo_url, repo_dir)
+    else:
+        update(status_message=f"Cloning to {repo_dir}...")
+        os.makedirs(base_dir, exist_ok=True)
+        Repo.clone_from(repo_url, repo_dir)
+
+    check_cancelled()
+    repo = Repo(repo_dir)
+    head_commit = repo.head.commit.hexsha
+
+    # Work out which files need (re-)embedding
+    update(stage="planning", progress=30, status_message="Checking for changed files...")
+    sql_repo_id = None
+    known_hashes = {}
+    db = SessionLocal()
+    try:
+        sql_repo = repo_crud.get_repository_by_url(db, repo_url)
+        if sql_repo:
+            sql_repo_id = sql_repo.id
+            if incremental:
+                known_hashes = repo_crud.get_indexed_file_hashes(db, sql_repo_id)
+    except Exception as sql_e:
+        print(f"Could not load indexed file hashes: {sql_e}")
+    finally:
+        db.close()
+
+    plan = incremental_svc.plan_ingest(
+        repo, repo_dir, head_commit,
+        previous_commit=previous_commit, known_hashes=known_hashes,
+    )
+
+    check_cancelled()
+    update(stage="search_index", status_message="Building search index...")
+    if not plan.is_noop or not os.path.exists(trigram_index.index_path(repo_dir)):
+        trigram_index.build_index(repo_dir, commit=head_commit)
+
+    if plan.is_noop:
+        if not os.path.exists(bm25_index.index_path(repo_id)):
+            ingestion.build_lexical_index(repo_id, repo_dir, repo_name)
+        update(
+            status="Indexed",
+            stage="done",
+            progress=100,
+            commit=head_commit,
+            status_message=f"Repository '{repo_name}' is up to date ({plan.unchanged} files unchanged)",
+            lastSynced=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        return
+
+    if not plan.files and plan.mode == "full":
+        raise IngestError("No supported files found")
+
+    if plan.mode == "incremental":
+        update(progress=40, status_message=(
+            f"Found {len(plan.files)} changed files "
+            f"({plan.unchanged} unchanged, {len(plan.removed)} removed)"
+        ))
+    else:
+        update(progress=40, status_message=f"Found {len(plan.files)} files")
+
+    check_cancelled()
+    store = get_vector_store()
+    store.ensure_index(dimension=384)  # all-MiniLM-L6-v2 dimension
+
+    # Drop stale vectors: the whole namespace on a full re-index, otherwise
+    # only those of modified and removed files
+    if plan.mode == "full":
+        # Forget the indexed commit and file hashes first, so that if this
+        # run fails after the wipe the next one is a full re-index as well
+        update(commit=None)
+        if sql_repo_id:
+            db = SessionLocal()
+            try:
+                repo_crud.sync_indexed_files(db, sql_repo_id, {}, replace_all=True)
+            finally:
+                db.close()
+        store.delete_namespace(repo_id)
+    else:
+        update(stage="removing", status_message="Removing outdated vectors...")
+        incremental_svc.delete_file_vectors(
+            store, repo_id, repo_name, list(plan.files) + plan.removed
+        )
+
+    # Read → split → embed → upsert, streamed in batches
+    update(stage="embedding", progress=45, status_message="Embedding and uploading vectors...")
+
+    def on_progress(stats):
+        check_cancelled()
+        total = max(stats["total_files"], 1)
+        update(
+            progress=45 + (stats["files"] * 50 // total),
+            ingest_stats=_progress_stats(stats),
+            status_message=(
+                f"Batch {stats['batches']} uploaded: {stats['chunks']} chunks "
+                f"from {stats['files']}/{stats['total_files']} files "
+                f"({stats['chunks_per_sec']:.1f} chunks/sec, {stats['cache_hit_ratio']:.0%} cache hits)"
+            ),
+        )
+
+    stats = ingestion.run_pipeline(
+        repo_dir, list(plan.files), repo_name,
+        upsert=lambda vectors: store.upsert(vectors, namespace=repo_id),
+        on_progress=on_progress,
+    )
+    check_cancelled()
+    store.flush(repo_id)
+
+    check_cancelled()
+    update(stage="keyword_index", status_message="Building keyword index...")
+    if plan.mode == "incremental":
+        ingestion.update_lexical_index(repo_id, repo_dir, repo_name, list(plan.files), plan.removed)
+    else:
+        ingestion.build_lexical_index(repo_id, repo_dir, repo_name)
+    check_cancelled()
+
+    # Record content hashes so the next run can skip unchanged files
+    if sql_repo_id:
+        db = SessionLocal()
+        try:
+            repo_crud.sync_indexed_files(
+                db, sql_repo_id, plan.files,
+                removed=plan.removed, replace_all=plan.mode == "full",
+            )
+        except Exception as sql_e:
+            print(f"Error saving indexed file hashes: {sql_e}")
+        finally:
+            db.close()
+
+    # Done
+    if plan.mode == "incremental":
+        message = (
+            f"Repository '{repo_name}' updated: {len(plan.files)} files re-embedded, "
+            f"{len(plan.removed)} removed, {plan.unchanged} unchanged "
+            f"({stats['chunks_per_sec']:.1f} chunks/sec, {stats['cache_hit_ratio']:.0%} cache hits)"
+        )
+    else:
+        message = (
+            f"Repository '{repo_name}' ingested successfully! "
+            f"({stats['chunks']} chunks, {stats['chunks_per_sec']:.1f} chunks/sec, "
+            f"{stats['cache_hit_ratio']:.0%} cache hits)"
+        )
+    update(
+        status="Indexed",
+        stage="done",
+        progress=100,
+        commit=head_commit,
+        ingest_stats=_progress_stats(stats),
+        status_message=message,
+        lastSynced=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    )
+    # Cached answers are keyed by the indexed commit, so the API process's
+    # answer cache stops serving the old ones once it sees the new commit
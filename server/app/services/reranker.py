@@ -0,0 +1,108 @@
+"""
+Optional cross-encoder reranking of retrieved chunks.
+
+With `settings.RERANK_ENABLED` the search tools over-fetch
+`settings.RERANK_CANDIDATES` chunks, score every (question, chunk) pair with a
+small CPU cross-encoder in batches, and keep the best chunks that fit in
+`settings.RERANK_TOKEN_BUDGET`. Every rerank is timed; the latency is returned
+with each reranked result as "rerank_ms" and summarised by `get_rerank_stats()`.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+
+_model = None
+_lock = threading.Lock()
+
+
+def get_cross_encoder():
+    """Return the process-wide cross-encoder, loading it on first use."""
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                from sentence_transformers import CrossEncoder
+                _model = CrossEncoder(settings.RERANK_MODEL, device="cpu")
+    return _model
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting prompt context."""
+    return max(1, len(text) // 4)
+
+
+class RerankStats:
+    """Latency of recent reranks."""
+
+    def __init__(self, window: int = 500):
+        self.requests = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, ms: float):
+        with self._lock:
+            self.requests += 1
+            self._recent.append(ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return {"requests": self.requests, "last_ms": None, "p50_ms": None, "p95_ms": None}
+        return {
+            "requests": self.requests,
+            "last_ms": round(self._recent[-1], 1),
+            "p50_ms": round(recent[len(recent) // 2], 1),
+            "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 1),
+        }
+
+
+_stats = RerankStats()
+
+
+def get_rerank_stats() -> Dict[str, Any]:
+    return _stats.stats()
+
+
+def rerank(
+    query: str,
+    candidates: List[Dict[str, Any]],
+    top_k: int,
+    token_budget: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Reorder `candidates` ({"id", "score", "metadata": {"text", ...}}) by
+    cross-encoder relevance to `query` and return at most `top_k` of them
+    whose texts fit in `token_budget`. Each result gets a "rerank_score" and
+    the latency of the whole rerank as "rerank_ms".
+    """
+    if not candidates:
+        return []
+    token_budget = settings.RERANK_TOKEN_BUDGET if token_budget is None else token_budget
+
+    started = time.monotonic()
+    pairs = [(query, c["metadata"].get("text", "")) for c in candidates]
+    scores = get_cross_encoder().predict(
+        pairs, batch_size=settings.RERANK_BATCH_SIZE, show_progress_bar=False
+    )
+    ranked = sorted(zip(candidates, scores), key=lambda cs: float(cs[1]), reverse=True)
+
+    selected = []
+    used = 0
+    for candidate, score in ranked:
+        tokens = estimate_tokens(candidate["metadata"].get("text", ""))
+        if selected and token_budget and used + tokens > token_budget:
+            continue  # A smaller chunk further down may still fit
+        selected.append({**candidate, "rerank_score": round(float(score), 4)})
+        used += tokens
+        if len(selected) >= top_k:
+            break
+
+    ms = (time.monotonic() - started) * 1000
+    _stats.record(ms)
+    for result in selected:
+        result["rerank_ms"] = round(ms, 1)
+    return selected
@@ -0,0 +1,84 @@
+"""
+Multi-query retrieval.
+
+A question is searched as several sub-queries (planner steps, or the local
+expansion from `query_router.expand_query`). All sub-queries are embedded in
+one batched forward pass, searched concurrently, and the ranked lists are
+merged with reciprocal-rank fusion: a chunk scores sum(1 / (RRF_K + rank))
+over the lists it appears in, so chunks that several phrasings agree on rise
+to the top. Chunks are deduplicated by their vector id.
+
+In hybrid mode (`settings.RETRIEVAL_MODE = "hybrid"`, the default) every
+sub-query is also run against the repository's BM25 index, whose chunks
+share the vector ids, and those rankings join the fusion, so exact
+identifiers and error strings surface even when the embedding misses them.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+from . import bm25_index
+from .embeddings import aembed_queries, embed_queries
+
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], limit: int, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """Merge ranked lists of {"id", "score", "metadata"} into one, best first."""
+    scores: Dict[str, float] = {}
+    first: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, match in enumerate(results, start=1):
+            chunk_id = match["id"]
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+            first.setdefault(chunk_id, match)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [{**first[i], "score": round(scores[i], 6)} for i in ranked]
+
+
+def _unique(queries: List[str]) -> List[str]:
+    seen = set()
+    result = []
+    for q in queries:
+        key = " ".join(q.lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            result.append(q)
+    return result
+
+
+def _lexical_results(queries: List[str], namespace: str, top_k: int, hybrid) -> List[List[Dict[str, Any]]]:
+    if hybrid is None:
+        hybrid = settings.RETRIEVAL_MODE == "hybrid"
+    index = bm25_index.get_index(namespace) if hybrid else None
+    if index is None:
+        return []
+    return [index.search(q, top_k=top_k) for q in queries]
+
+
+def multi_query_search(
+    store, queries: List[str], namespace: str, top_k: int = 5, hybrid: Optional[bool] = None
+) -> List[Dict[str, Any]]:
+    queries = _unique(queries)
+    if not queries:
+        return []
+    vectors = embed_queries(queries)
+    result_lists = [store.query(v, top_k=top_k, namespace=namespace) for v in vectors]
+    result_lists += _lexical_results(queries, namespace, top_k, hybrid)
+    return reciprocal_rank_fusion(result_lists, limit=top_k)
+
+
+async def amulti_query_search(
+    store, queries: List[str], namespace: str, top_k: int = 5, hybrid: Optional[bool] = None
+) -> List[Dict[str, Any]]:
+    queries = _unique(queries)
+    if not queries:
+        return []
+    vectors = await aembed_queries(queries)
+    result_lists = await asyncio.gather(
+        *(store.aquery(v, top_k=top_k, namespace=namespace) for v in vectors),
+        asyncio.to_thread(_lexical_results, queries, namespace, top_k, hybrid),
+    )
+    *vector_lists, lexical_lists = result_lists
+    return reciprocal_rank_fusion(vector_lists + lexical_lists, limit=top_k)
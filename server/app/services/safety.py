@@ -0,0 +1,146 @@
+"""
+Safety review of generated answers.
+
+Every answer first goes through `precheck()`, a cheap local scan for leaked
+secrets and destructive commands. The LLM review (`SafetyAgent`) is then run
+according to `settings.SAFETY_MODE`:
+
+- "async" (default): the answer is returned right away and the review runs as
+  a background task; its verdict is stored under the answer id and can be
+  fetched later with `get_review()`.
+- "sync": the review runs before the answer is returned.
+- "off": only the local pre-check is applied.
+"""
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+
+MAX_REVIEWS = 10000
+
+_SECRET_PATTERNS = [
+    ("aws_access_key", re.compile(r"\bAKIA[0-9A-Z]{16}\b")),
+    ("github_token", re.compile(r"\bgh[pousr]_[A-Za-z0-9]{36,}\b")),
+    ("private_key", re.compile(r"-----BEGIN (?:RSA |EC |OPENSSH |DSA )?PRIVATE KEY-----")),
+    ("api_key_assignment", re.compile(
+        r"(?i)\b(?:api[_-]?key|secret|password|token)\b\s*[:=]\s*['\"][^'\"\s]{16,}['\"]"
+    )),
+]
+
+_DANGEROUS_PATTERNS = [
+    ("destructive_command", re.compile(r"\brm\s+-[a-z]*r[a-z]*f?[a-z]*\s+(?:/|~|\*)(?:\s|$)")),
+    ("destructive_command", re.compile(r"(?i)\b(?:mkfs|dd\s+if=.*of=/dev/)")),
+    ("destructive_sql", re.compile(r"(?i)\bDROP\s+(?:DATABASE|SCHEMA)\b")),
+    ("pipe_to_shell", re.compile(r"(?i)\b(?:curl|wget)\b[^\n|]*\|\s*(?:sudo\s+)?(?:ba|z)?sh\b")),
+]
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+_FLAGGED_RE = re.compile(r"\b(?:FLAG(?:GED)?|UNSAFE|NOT SAFE)\b")
+_SAFE_RE = re.compile(r"\bSAFE\b")
+
+
+def precheck(answer: str) -> Dict[str, Any]:
+    """Local heuristic scan. Returns {"passed": bool, "flags": [...]}."""
+    flags: List[str] = []
+    if not answer or not answer.strip():
+        flags.append("empty_answer")
+    for name, pattern in _SECRET_PATTERNS + _DANGEROUS_PATTERNS:
+        if name not in flags and pattern.search(answer or ""):
+            flags.append(name)
+    return {"passed": not flags, "flags": flags}
+
+
+def parse_verdict(review: str) -> str:
+    """
+    Map the reviewer's free-text reply to "safe" or "flagged". The verdict is
+    read from the first non-empty line with markdown and punctuation removed
+    ("**FLAGGED**", "Verdict: FLAGGED"); a reply with neither verdict fails
+    closed as "flagged".
+    """
+    lines = [line for line in (review or "").splitlines() if line.strip()]
+    head = _NON_WORD_RE.sub(" ", lines[0]).upper() if lines else ""
+    if _FLAGGED_RE.search(head):
+        return "flagged"
+    if _SAFE_RE.search(head):
+        return "safe"
+    return "flagged"
+
+
+class SafetyReviews:
+    """Bounded in-memory store of review verdicts, keyed by answer id."""
+
+    def __init__(self, max_entries: int = MAX_REVIEWS):
+        self.max_entries = max_entries
+        self._reviews: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, answer_id: str, review: Dict[str, Any]):
+        with self._lock:
+            self._reviews[answer_id] = review
+            self._reviews.move_to_end(answer_id)
+            while len(self._reviews) > self.max_entries:
+                self._reviews.popitem(last=False)
+
+    def update(self, answer_id: str, **fields):
+        with self._lock:
+            if answer_id in self._reviews:
+                self._reviews[answer_id].update(fields)
+
+    def get(self, answer_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            review = self._reviews.get(answer_id)
+            return dict(review) if review is not None else None
+
+
+reviews = SafetyReviews()
+_tasks = set()  # Strong references so pending reviews are not garbage collected
+
+
+async def _run_review(answer_id: str, answer: str, agent, prechecked: bool):
+    started = time.monotonic()
+    try:
+        result = await agent.check_response(answer)
+        verdict = parse_verdict(result["review"])
+        if not prechecked:
+            verdict = "flagged"  # The local pre-check outranks a "safe" from the LLM
+        reviews.update(
+            answer_id,
+            status=verdict,
+            review=result["review"],
+            seconds=round(time.monotonic() - started, 2),
+        )
+    except Exception as e:
+        reviews.update(answer_id, status="error", review=f"Safety review failed: {e}")
+
+
+async def review_answer(answer_id: str, answer: str, agent) -> Dict[str, Any]:
+    """
+    Pre-check `answer` and run (or schedule) the LLM review per SAFETY_MODE.
+    Returns the review record as it stands when the answer is handed back.
+    """
+    check = precheck(answer)
+    mode = settings.SAFETY_MODE
+    reviews.put(answer_id, {
+        "answer_id": answer_id,
+        "status": "flagged" if not check["passed"] else ("skipped" if mode == "off" else "pending"),
+        "flags": check["flags"],
+        "review": None,
+    })
+
+    if mode == "sync":
+        await _run_review(answer_id, answer, agent, check["passed"])
+    elif mode != "off":
+        task = asyncio.create_task(_run_review(answer_id, answer, agent, check["passed"]))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+    return reviews.get(answer_id)
+
+
+def get_review(answer_id: str) -> Optional[Dict[str, Any]]:
+    """Stored verdict for an answer, or None if unknown (or evicted)."""
+    return reviews.get(answer_id)
@@ -1,63 +1,178 @@
-from langchain_core.tools import tool
-from typing import List, Dict, Any
+from langchain_core.tools import tool, StructuredTool
+from typing import List, Dict, Any, Optional
+import asyncio
 import os
-try:
-    from pinecone import Pinecone
-except ImportError:
-    pass
+import re
+import httpx
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from ..core.config import settings
+from .embeddings import embed_query, aembed_query
+from .code_search import search_files
+from .vector_store import get_vector_store
+from .retrieval import multi_query_search, amulti_query_search
+from .reranker import rerank as rerank_results
 
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-
-pc = None
-index = None
+store = None
 
 try:
-    if settings.PINECONE_API_KEY:
-        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        index = pc.Index(settings.PINECONE_INDEX)
+    if settings.VECTOR_STORE == "local" or settings.PINECONE_API_KEY:
+        store = get_vector_store()
 except Exception as e:
-    print(f"Pinecone init error: {e}")
+    print(f"Vector store init error: {e}")
 
-@tool
-def vector_search(query: str, repo_id: str = None, top_k: int = 5) -> List[Dict[str, Any]]:
+def _format_matches(results: List[Dict[str, Any]], truncate: bool = True) -> List[Dict[str, Any]]:
+    matches = []
+    for match in results:
+        text = match["metadata"].get("text", "")
+        item = {
+            "file": match["metadata"].get("source", "unknown"),
+            # Reranked results are already sized by the token budget
+            "content": text[:500] + "..." if truncate else text, # Truncate for display
+            "score": match["score"]
+        }
+        if match["metadata"].get("start_line"):
+            item["start_line"] = int(match["metadata"]["start_line"])
+            item["end_line"] = int(match["metadata"]["end_line"])
+        if "rerank_score" in match:
+            item["rerank_score"] = match["rerank_score"]
+            item["rerank_ms"] = match["rerank_ms"]
+        matches.append(item)
+    return matches
+
+def _is_hybrid(hybrid: Optional[bool]) -> bool:
+    return settings.RETRIEVAL_MODE == "hybrid" if hybrid is None else hybrid
+
+def _is_rerank(rerank: Optional[bool]) -> bool:
+    return settings.RERANK_ENABLED if rerank is None else rerank
+
+def _fetch_k(top_k: int, reranking: bool) -> int:
+    # Over-fetch candidates for the cross-encoder to choose from
+    return max(top_k, settings.RERANK_CANDIDATES) if reranking else top_k
+
+def _search(queries: List[str], repo_id: str, top_k: int, hybrid: Optional[bool], rerank: Optional[bool], truncate: bool = True):
+    reranking = _is_rerank(rerank)
+    fetch_k = _fetch_k(top_k, reranking)
+    if len(queries) > 1 or _is_hybrid(hybrid):
+        results = multi_query_search(store, queries, namespace=repo_id, top_k=fetch_k, hybrid=_is_hybrid(hybrid))
+    else:
+        # Query specific namespace for this repo
+        results = store.query(embed_query(queries[0]), top_k=fetch_k, namespace=repo_id)
+    if reranking:
+        results = rerank_results(queries[0], results, top_k)
+    return _format_matches(results, truncate=truncate and not reranking)
+
+async def _asearch(queries: List[str], repo_id: str, top_k: int, hybrid: Optional[bool], rerank: Optional[bool], truncate: bool = True):
+    reranking = _is_rerank(rerank)
+    fetch_k = _fetch_k(top_k, reranking)
+    if len(queries) > 1 or _is_hybrid(hybrid):
+        results = await amulti_query_search(store, queries, namespace=repo_id, top_k=fetch_k, hybrid=_is_hybrid(hybrid))
+    else:
+        results = await store.aquery(await aembed_query(queries[0]), top_k=fetch_k, namespace=repo_id)
+    if reranking:
+        # CPU-bound: keep it off the event loop
+        results = await asyncio.to_thread(rerank_results, queries[0], results, top_k)
+    return _format_matches(results, truncate=truncate and not reranking)
+
+def _vector_search(
+    query: str, repo_id: str = None, top_k: int = 5,
+    hybrid: Optional[bool] = None, rerank: Optional[bool] = None, truncate: bool = True,
+) -> List[Dict[str, Any]]:
     """
-    Search for relevant code chunks using Pinecone vector search.
+    Search for relevant code chunks using vector search.
     Returns a list of matches with file paths and text snippets.
     Args:
         query: The search query
         repo_id: The repository ID to search in (namespace)
         top_k: Number of results to return
+        hybrid: Fuse with BM25 keyword search (defaults to RETRIEVAL_MODE)
+        rerank: Rerank over-fetched candidates with a cross-encoder (defaults to RERANK_ENABLED);
+            reranked matches carry "rerank_score" and the rerank latency "rerank_ms"
+        truncate: Cut each snippet to 500 characters
     """
-    if not index:
-        return [{"error": "Pinecone not initialized or invalid key."}]
+    if not store:
+        return [{"error": "Vector store not initialized or invalid key."}]
     
     if not repo_id:
         return [{"error": "Please specify a repo_id to search in"}]
     
     try:
-        vector = embeddings.embed_query(query)
-        # Query specific namespace for this repo
-        results = index.query(
-            vector=vector, 
-            top_k=top_k, 
-            include_metadata=True,
-            namespace=repo_id  # Search only in this repo's namespace
-        )
-        
-        matches = []
-        for match in results.matches:
-            matches.append({
-                "file": match.metadata.get("source", "unknown"),
-                "content": match.metadata.get("text", "")[:500] + "...", # Truncate for display
-                "score": match.score
-            })
-        return matches
+        return _search([query], repo_id, top_k, hybrid, rerank, truncate)
+    except Exception as e:
+        return [{"error": str(e)}]
+
+async def _avector_search(
+    query: str, repo_id: str = None, top_k: int = 5,
+    hybrid: Optional[bool] = None, rerank: Optional[bool] = None, truncate: bool = True,
+) -> List[Dict[str, Any]]:
+    if not store:
+        return [{"error": "Vector store not initialized or invalid key."}]
+
+    if not repo_id:
+        return [{"error": "Please specify a repo_id to search in"}]
+
+    try:
+        return await _asearch([query], repo_id, top_k, hybrid, rerank, truncate)
+    except Exception as e:
+        return [{"error": str(e)}]
+
+def _multi_vector_search(
+    queries: List[str], repo_id: str = None, top_k: int = 5,
+    hybrid: Optional[bool] = None, rerank: Optional[bool] = None, truncate: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Search for several phrasings of a question at once.
+    The queries are embedded in one batch, searched concurrently and the
+    results merged with reciprocal-rank fusion, without duplicate chunks.
+    Args:
+        queries: The sub-queries to search for; the first one is the question
+        repo_id: The repository ID to search in (namespace)
+        top_k: Number of merged results to return
+        hybrid: Also fuse BM25 keyword rankings (defaults to RETRIEVAL_MODE)
+        rerank: Rerank the merged candidates against the question (defaults to RERANK_ENABLED);
+            reranked matches carry "rerank_score" and the rerank latency "rerank_ms"
+        truncate: Cut each snippet to 500 characters
+    """
+    if not store:
+        return [{"error": "Vector store not initialized or invalid key."}]
+
+    if not repo_id:
+        return [{"error": "Please specify a repo_id to search in"}]
+
+    if not queries:
+        return []
+
+    try:
+        return _search(queries, repo_id, top_k, hybrid, rerank, truncate)
     except Exception as e:
         return [{"error": str(e)}]
 
+async def _amulti_vector_search(
+    queries: List[str], repo_id: str = None, top_k: int = 5,
+    hybrid: Optional[bool] = None, rerank: Optional[bool] = None, truncate: bool = True,
+) -> List[Dict[str, Any]]:
+    if not store:
+        return [{"error": "Vector store not initialized or invalid key."}]
+
+    if not repo_id:
+        return [{"error": "Please specify a repo_id to search in"}]
+
+    if not queries:
+        return []
+
+    try:
+        return await _asearch(queries, repo_id, top_k, hybrid, rerank, truncate)
+    except Exception as e:
+        return [{"error": str(e)}]
+
+# Sync and async implementations: agents call `ainvoke` so a slow search
+# never blocks the event loop
+vector_search = StructuredTool.from_function(
+    func=_vector_search, coroutine=_avector_search, name="vector_search"
+)
+multi_vector_search = StructuredTool.from_function(
+    func=_multi_vector_search, coroutine=_amulti_vector_search, name="multi_vector_search"
+)
+
 @tool
 def read_repository_file(file_path: str) -> str:
     """Read contents of a file from the repository. Path should be relative to repo root or absolute."""
@@ -85,38 +200,69 @@ def read_repository_file(file_path: str) -> str:
         return str(e)
 
 @tool
-def search_code_fs(query: str) -> List[str]:
+def search_code_fs(query: str, regex: bool = False, ignore_case: bool = False) -> List[str]:
     """
     Search for a string pattern in the repository files (grep-like).
     Useful if vector search fails or for exact matches.
+    Set regex=True to search with a regular expression.
     """
     repo_name = "object-identity-ai-gcp"
     repo_path = os.path.join(os.getcwd(), "repos", repo_name)
-    matches = []
     
     if not os.path.exists(repo_path):
         return ["Repository not found."]
 
-    for root, _, files in os.walk(repo_path):
-        if ".git" in root: continue
-        for file in files:
-            path = os.path.join(root, file)
-            try:
-                with open(path, "r", encoding="utf-8", errors='ignore') as f:
-                    content = f.read()
-                    if query in content:
-                        # Find line number or snippet?
-                        lines = content.split('\n')
-                        for i, line in enumerate(lines):
-                            if query in line:
-                                matches.append(f"{path}:{i+1}: {line.strip()}")
-            except: pass
-            if len(matches) > 20: break # Limit results
-            
-    return matches
+    try:
+        result = search_files(repo_path, [query], regex=regex, ignore_case=ignore_case, limit=20)
+    except ValueError as e:
+        return [str(e)]
 
-@tool
-def search_github_issues(repo_url: str) -> List[Dict[str, Any]]:
+    return [
+        f"{os.path.join(repo_path, m['file'])}:{m['line']}: {m['text']}"
+        for m in result["matches"]
+    ]
+
+def _issues_request(repo_url: str) -> Dict[str, Any]:
+    """Arguments of the GitHub issues API request, or {"error": ...}."""
+    match = re.search(r"github\.com/([^/]+)/([^/]+)", repo_url)
+    if not match:
+        return {"error": "Not a valid GitHub repository URL"}
+
+    owner = match.group(1)
+    repo_name = match.group(2).replace(".git", "")
+
+    headers = {"Accept": "application/vnd.github+json"}
+    token = settings.GITHUB_ACCESS_TOKEN or settings.GITHUB_TOKEN
+    if token and len(token) > 10 and not token.startswith("your_"):
+        headers["Authorization"] = f"Bearer {token}"
+
+    return {
+        "url": f"https://api.github.com/repos/{owner}/{repo_name}/issues",
+        "params": {"state": "open", "per_page": 15},
+        "headers": headers,
+        "timeout": 15.0,
+    }
+
+def _parse_issues(response) -> List[Dict[str, Any]]:
+    if response.status_code != 200:
+        return [{"error": f"GitHub API returned {response.status_code}"}]
+
+    issues = []
+    for issue in response.json():
+        if "pull_request" in issue:
+            continue
+        issues.append({
+            "number": issue["number"],
+            "title": issue["title"],
+            "labels": [l["name"] for l in issue.get("labels", [])],
+            "user": issue["user"]["login"] if issue.get("user") else "unknown",
+            "html_url": issue["html_url"],
+            "body": (issue.get("body") or "")[:150]
+        })
+
+    return issues
+
+def _search_github_issues(repo_url: str) -> List[Dict[str, Any]]:
     """
     Fetch open GitHub issues for a repository.
     Args:
@@ -124,49 +270,31 @@ def search_github_issues(repo_url: str) -> List[Dict[str, Any]]:
     Returns:
         A list of open issues with number, title, labels, user, and URL.
     """
-    import re
-    import httpx
+    request = _issues_request(repo_url)
+    if "error" in request:
+        return [request]
 
-    match = re.search(r"github\.com/([^/]+)/([^/]+)", repo_url)
-    if not match:
-        return [{"error": "Not a valid GitHub repository URL"}]
+    try:
+        return _parse_issues(httpx.get(**request))
+    except Exception as e:
+        return [{"error": f"Failed to fetch issues: {str(e)}"}]
 
-    owner = match.group(1)
-    repo_name = match.group(2).replace(".git", "")
+async def _asearch_github_issues(repo_url: str) -> List[Dict[str, Any]]:
+    request = _issues_request(repo_url)
+    if "error" in request:
+        return [request]
 
     try:
-        headers = {"Accept": "application/vnd.github+json"}
-        token = settings.GITHUB_ACCESS_TOKEN or settings.GITHUB_TOKEN
-        if token and len(token) > 10 and not token.startswith("your_"):
-            headers["Authorization"] = f"Bearer {token}"
-
-        response = httpx.get(
-            f"https://api.github.com/repos/{owner}/{repo_name}/issues",
-            params={"state": "open", "per_page": 15},
-            headers=headers,
-            timeout=15.0
-        )
-
-        if response.status_code != 200:
-            return [{"error": f"GitHub API returned {response.status_code}"}]
-
-        issues = []
-        for issue in response.json():
-            if "pull_request" in issue:
-                continue
-            issues.append({
-                "number": issue["number"],
-                "title": issue["title"],
-                "labels": [l["name"] for l in issue.get("labels", [])],
-                "user": issue["user"]["login"] if issue.get("user") else "unknown",
-                "html_url": issue["html_url"],
-                "body": (issue.get("body") or "")[:150]
-            })
-
-        return issues
+        async with httpx.AsyncClient(timeout=request.pop("timeout")) as client:
+            response = await client.get(**request)
+        return _parse_issues(response)
     except Exception as e:
         return [{"error": f"Failed to fetch issues: {str(e)}"}]
 
+search_github_issues = StructuredTool.from_function(
+    func=_search_github_issues, coroutine=_asearch_github_issues, name="search_github_issues"
+)
+
 @tool
 def get_pr_diff(pr_number: int) -> str:
     """Get the diff for a pull request."""
@@ -174,4 +302,4 @@ def get_pr_diff(pr_number: int) -> str:
     return ""
 
 def get_all_tools():
-    return [vector_search, read_repository_file, search_code_fs, search_github_issues, get_pr_diff]
+    return [vector_search, multi_vector_search, read_repository_file, search_code_fs, search_github_issues, get_pr_diff]
@@ -0,0 +1,151 @@
+"""
+Trigram index for grep-style search.
+
+Built at ingest time and stored next to the clone as
+`repos/<name>.trigrams.sqlite3`. For every text file it records which
+(lower-cased) trigrams occur in it, so an exact-string search only has to
+open the files that contain every trigram of the pattern instead of walking
+and reading the whole repository.
+"""
+import os
+import sqlite3
+import time
+from array import array
+from typing import Dict, List, Optional, Set
+
+MAX_INDEXED_FILE_BYTES = 1024 * 1024  # Larger files are always treated as candidates
+
+
+def index_path(repo_dir: str) -> str:
+    return repo_dir.rstrip("/\\") + ".trigrams.sqlite3"
+
+
+def trigrams(text: str) -> Set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _read_text(path: str) -> Optional[str]:
+    """File contents, or None for binary files."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"\0" in data[:8192]:
+        return None
+    return data.decode("utf-8", errors="ignore")
+
+
+def build_index(repo_dir: str, commit: Optional[str] = None) -> Dict[str, int]:
+    """(Re)build the trigram index of a cloned repository."""
+    started = time.monotonic()
+    files: List[tuple] = []
+    postings: Dict[str, array] = {}
+
+    for root, _, names in os.walk(repo_dir):
+        if ".git" in root:
+            continue
+        for name in names:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, repo_dir).replace(os.sep, "/")
+            try:
+                size = os.path.getsize(path)
+                if size > MAX_INDEXED_FILE_BYTES:
+                    files.append((len(files), rel, 0))
+                    continue
+                text = _read_text(path)
+            except OSError:
+                continue
+            if text is None:
+                continue
+
+            file_id = len(files)
+            files.append((file_id, rel, 1))
+            for gram in trigrams(text):
+                ids = postings.get(gram)
+                if ids is None:
+                    ids = postings[gram] = array("I")
+                ids.append(file_id)
+
+    # Write to a temp file and swap it in so searches never see a partial index
+    target = index_path(repo_dir)
+    tmp = target + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT NOT NULL, indexed INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE postings (trigram TEXT PRIMARY KEY, file_ids BLOB NOT NULL)")
+        conn.executemany("INSERT INTO files VALUES (?, ?, ?)", files)
+        conn.executemany(
+            "INSERT INTO postings VALUES (?, ?)",
+            ((gram, ids.tobytes()) for gram, ids in postings.items()),
+        )
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("commit", commit or ""), ("built_at", str(time.time()))],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, target)
+
+    return {
+        "files": len(files),
+        "trigrams": len(postings),
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+def candidate_files(repo_dir: str, pattern: str) -> Optional[List[str]]:
+    """
+    Relative paths of the files that may contain `pattern` (case-insensitively).
+    Returns None when the repository has no index, so callers can fall back
+    to a full walk.
+    """
+    path = index_path(repo_dir)
+    if not os.path.exists(path):
+        return None
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        grams = trigrams(pattern)
+        if not grams:
+            # Too short to filter on: every indexed file is a candidate
+            return [p for (p,) in conn.execute("SELECT path FROM files ORDER BY id")]
+
+        lists = []
+        for gram in grams:
+            row = conn.execute("SELECT file_ids FROM postings WHERE trigram = ?", (gram,)).fetchone()
+            if row is None:
+                lists = []
+                break
+            ids = array("I")
+            ids.frombytes(row[0])
+            lists.append(ids)
+
+        matched: Set[int] = set()
+        if lists:
+            lists.sort(key=len)
+            matched = set(lists[0])
+            for ids in lists[1:]:
+                matched.intersection_update(ids)
+                if not matched:
+                    break
+
+        matched.update(file_id for (file_id,) in conn.execute("SELECT id FROM files WHERE indexed = 0"))
+        if not matched:
+            return []
+
+        ids = sorted(matched)
+        paths = []
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            paths.extend(
+                p for (p,) in conn.execute(
+                    f"SELECT path FROM files WHERE id IN ({','.join('?' * len(part))}) ORDER BY id", part
+                )
+            )
+        return paths
+    finally:
+        conn.close()
+
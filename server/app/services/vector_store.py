@@ -0,0 +1,504 @@
+"""
+Vector store backends.
+
+Every ingest and search path talks to a `VectorStore`, selected with
+`settings.VECTOR_STORE`:
+
+- "pinecone" (default): the hosted Pinecone index, one namespace per repo.
+- "local": an on-disk index under `settings.LOCAL_INDEX_DIR`. Each namespace
+  is a memory-mapped float32 matrix (`vectors.npy`) of L2-normalised vectors
+  plus a JSON metadata sidecar, written as a new version directory on every
+  flush and published by atomically replacing a `CURRENT` pointer file.
+  Search is exact (one matrix-vector product), or IVF over k-means lists
+  once a namespace grows past `settings.LOCAL_INDEX_IVF_THRESHOLD` vectors.
+
+Query results are plain dicts: {"id": str, "score": float, "metadata": dict}.
+"""
+import asyncio
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Set
+
+from ..core.config import settings
+
+
+class VectorStore:
+    """Interface shared by all vector store backends."""
+
+    def query(self, vector: List[float], top_k: int, namespace: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def aquery(self, vector: List[float], top_k: int, namespace: str) -> List[Dict[str, Any]]:
+        """Async `query`. Runs the blocking query in a thread unless a backend overrides it."""
+        return await asyncio.to_thread(self.query, vector, top_k, namespace)
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str) -> None:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str, namespace: str) -> int:
+        """Delete every vector whose id starts with `prefix`."""
+        raise NotImplementedError
+
+    def delete_namespace(self, namespace: str) -> None:
+        raise NotImplementedError
+
+    def list_namespaces(self) -> Set[str]:
+        raise NotImplementedError
+
+    def ensure_index(self, dimension: int) -> None:
+        """Create the underlying index if the backend needs one."""
+
+    def flush(self, namespace: str) -> None:
+        """Persist buffered writes. Called at the end of an ingest."""
+
+    async def aclose(self) -> None:
+        """Close the clients the backend holds. Called when the app shuts down."""
+
+
+# ---------------------------------------------------------------------------
+# Pinecone
+# ---------------------------------------------------------------------------
+
+
+class PineconeVectorStore(VectorStore):
+    def __init__(self):
+        from pinecone import Pinecone
+
+        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+        self.index_name = settings.PINECONE_INDEX
+        self._index = None
+        # One asyncio client per event loop (each owns an aiohttp session),
+        # created under a per-loop asyncio.Lock and closed by `aclose`
+        self._async_clients: Dict[Any, Any] = {}
+        self._async_locks: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._async_guard = threading.Lock()
+        self._async_available = True
+        self._host = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self.pc.Index(self.index_name)
+        return self._index
+
+    def query(self, vector, top_k, namespace):
+        results = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            namespace=namespace,
+        )
+        return [
+            {"id": m.id, "score": m.score, "metadata": m.metadata or {}}
+            for m in results.matches
+        ]
+
+    async def aquery(self, vector, top_k, namespace):
+        index = await self._get_async_index() if self._async_available else None
+        if index is None:
+            # SDK without asyncio support: fall back to a worker thread
+            return await super().aquery(vector, top_k, namespace)
+
+        results = await index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            namespace=namespace,
+        )
+        return [
+            {"id": m.id, "score": m.score, "metadata": m.metadata or {}}
+            for m in results.matches
+        ]
+
+    async def _get_async_index(self):
+        """
+        Asyncio index client bound to the running event loop, or None when the
+        SDK has no asyncio support (remembered, so later queries skip it).
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is not None:
+            return client
+
+        with self._async_guard:
+            lock = self._async_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            client = self._async_clients.get(loop)
+            if client is not None or not self._async_available:
+                return client
+            try:
+                if self._host is None:
+                    # describe_index is a blocking HTTP call; resolve the host once
+                    description = await asyncio.to_thread(self.pc.describe_index, self.index_name)
+                    self._host = description.host
+                client = self.pc.IndexAsyncio(host=self._host)
+            except Exception as e:
+                print(f"Pinecone asyncio client unavailable, querying in a thread: {e}")
+                self._async_available = False
+                return None
+            with self._async_guard:
+                # Clients of loops that have since closed can no longer be closed cleanly
+                for stale in [l for l in self._async_clients if l.is_closed()]:
+                    del self._async_clients[stale]
+                self._async_clients[loop] = client
+        return client
+
+    async def aclose(self):
+        current = asyncio.get_running_loop()
+        with self._async_guard:
+            clients = list(self._async_clients.items())
+            self._async_clients.clear()
+        for loop, client in clients:
+            try:
+                if loop is current:
+                    await client.close()
+                elif loop.is_running():
+                    await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.close(), loop))
+            except Exception as e:
+                print(f"Could not close Pinecone asyncio client: {e}")
+
+    def upsert(self, vectors, namespace):
+        self.index.upsert(vectors=vectors, namespace=namespace)
+
+    def delete_prefix(self, prefix, namespace):
+        deleted = 0
+        for ids in self.index.list(prefix=prefix, namespace=namespace):
+            if ids:
+                self.index.delete(ids=list(ids), namespace=namespace)
+                deleted += len(ids)
+        return deleted
+
+    def delete_namespace(self, namespace):
+        try:
+            self.index.delete(delete_all=True, namespace=namespace)
+        except Exception:
+            pass  # Pinecone raises for namespaces that were never written
+
+    def list_namespaces(self):
+        stats = self.index.describe_index_stats()
+        return set(stats.namespaces.keys()) if stats.namespaces else set()
+
+    def ensure_index(self, dimension):
+        import time
+        from pinecone import ServerlessSpec
+
+        existing_indexes = [index.name for index in self.pc.list_indexes()]
+        if self.index_name in existing_indexes:
+            return
+
+        print(f"Index {self.index_name} does not exist, creating it...")
+        self.pc.create_index(
+            name=self.index_name,
+            dimension=dimension,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+        )
+        while not self.pc.describe_index(self.index_name).status["ready"]:
+            time.sleep(1)
+
+
+# ---------------------------------------------------------------------------
+# Local memory-mapped index
+# ---------------------------------------------------------------------------
+
+_NAMESPACE_RE = re.compile(r"^[\w.\-]+$")
+CURRENT_FILE = "CURRENT"  # Names the namespace's live version directory
+
+
+class _LocalNamespace:
+    """
+    One namespace of the local index.
+
+    Writes are staged in memory and merged into the matrix lazily (before a
+    query, or on flush), so an ingest that upserts thousands of batches does
+    not rewrite the matrix after each one.
+    """
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        self.np = np
+        self.path = path
+        self.lock = threading.RLock()
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.matrix = None
+        self.ivf = None  # (centroids, order, offsets)
+        self.staged: Dict[str, Any] = {}
+        self.deleted: Set[str] = set()
+        self.dirty = False  # merged changes not yet written to disk
+        self.version = None  # on-disk version this instance last loaded or wrote
+        self._load()
+
+    def _file(self, name: str, version: Optional[str] = None) -> str:
+        version = self.version if version is None else version
+        return os.path.join(self.path, version or "", name)
+
+    def disk_version(self) -> Optional[str]:
+        """The version named by the CURRENT pointer ("" for the legacy unversioned layout)."""
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE), "r") as f:
+                return f.read().strip()
+        except OSError:
+            return "" if os.path.exists(os.path.join(self.path, "vectors.npy")) else None
+
+    def _load(self):
+        np = self.np
+        for _ in range(3):
+            version = self.disk_version()
+            if version is None:
+                return
+            try:
+                matrix = np.load(self._file("vectors.npy", version), mmap_mode="r")
+                with open(self._file("metadata.json", version), "r") as f:
+                    rows = json.load(f)
+                ivf = None
+                if os.path.exists(self._file("ivf.npz", version)):
+                    data = np.load(self._file("ivf.npz", version))
+                    ivf = (data["centroids"], data["order"], data["offsets"])
+            except FileNotFoundError:
+                continue  # Pruned by a writer after we read CURRENT; read it again
+            self.version = version
+            self.matrix = matrix
+            self.ids = [r["id"] for r in rows]
+            self.metadata = [r["metadata"] for r in rows]
+            self.ivf = ivf
+            return
+
+    @property
+    def size(self) -> int:
+        return len(self.ids) + len(self.staged)
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        np = self.np
+        with self.lock:
+            for v in vectors:
+                vec = np.asarray(v["values"], dtype=np.float32)
+                norm = np.linalg.norm(vec)
+                if norm > 0:
+                    vec = vec / norm
+                self.staged[v["id"]] = (vec, v.get("metadata") or {})
+                self.deleted.discard(v["id"])
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self.lock:
+            doomed = {i for i in self.ids if i.startswith(prefix)}
+            staged = [i for i in self.staged if i.startswith(prefix)]
+            for i in staged:
+                del self.staged[i]
+            self.deleted |= doomed
+            return len(doomed) + len(staged)
+
+    def _merge(self):
+        """Fold staged writes and deletes into the matrix."""
+        np = self.np
+        if not self.staged and not self.deleted:
+            return
+
+        replaced = self.deleted | set(self.staged)
+        keep = [row for row, i in enumerate(self.ids) if i not in replaced]
+        parts = []
+        if self.matrix is not None and keep:
+            parts.append(np.asarray(self.matrix[keep], dtype=np.float32))
+        if self.staged:
+            parts.append(np.stack([vec for vec, _ in self.staged.values()]))
+
+        self.ids = [self.ids[row] for row in keep] + list(self.staged)
+        self.metadata = [self.metadata[row] for row in keep] + [m for _, m in self.staged.values()]
+        self.matrix = np.concatenate(parts) if parts else None
+        self.staged.clear()
+        self.deleted.clear()
+        self.ivf = None
+        self.dirty = True
+
+    def _build_ivf(self):
+        np = self.np
+        n = len(self.ids)
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        sample = self.matrix[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(10):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    mean = members.mean(axis=0)
+                    centroids[c] = mean / (np.linalg.norm(mean) or 1.0)
+
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65536):
+            block = self.matrix[start:start + 65536]
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+        self.ivf = (centroids, order, offsets)
+
+    def flush(self):
+        np = self.np
+        with self.lock:
+            self._merge()
+            if not self.dirty:
+                return
+            self.dirty = False
+            if not self.ids:
+                shutil.rmtree(self.path, ignore_errors=True)
+                self.version = None
+                return
+
+            threshold = settings.LOCAL_INDEX_IVF_THRESHOLD
+            if threshold and len(self.ids) >= threshold:
+                self._build_ivf()
+
+            # Write a new version directory, then point CURRENT at it with a
+            # single atomic rename. Readers (in any process) load whichever
+            # complete version CURRENT names, and files another process may
+            # have memory-mapped are never overwritten in place.
+            version = f"v{time.time_ns()}-{os.getpid()}"
+            os.makedirs(os.path.join(self.path, version))
+            np.save(self._file("vectors.npy", version), self.matrix)
+            with open(self._file("metadata.json", version), "w") as f:
+                json.dump([{"id": i, "metadata": m} for i, m in zip(self.ids, self.metadata)], f)
+            if self.ivf is not None:
+                centroids, order, offsets = self.ivf
+                np.savez(self._file("ivf.npz", version), centroids=centroids, order=order, offsets=offsets)
+            pointer = os.path.join(self.path, CURRENT_FILE + ".tmp")
+            with open(pointer, "w") as f:
+                f.write(version)
+            os.replace(pointer, os.path.join(self.path, CURRENT_FILE))
+
+            previous = self.version
+            self.version = version
+            self.matrix = np.load(self._file("vectors.npy"), mmap_mode="r")
+            self._prune(keep={version, previous})
+
+    def _prune(self, keep: Set[Optional[str]]):
+        """
+        Remove old versions, keeping the current and previous ones for readers
+        that are still loading them. Removal fails harmlessly on Windows while
+        another process has a version mapped; it is retried on the next flush.
+        """
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name in keep or name.startswith(CURRENT_FILE):
+                continue
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif name in ("vectors.npy", "metadata.json", "ivf.npz") and "" not in keep:
+                    os.remove(path)  # Legacy unversioned layout
+            except OSError:
+                pass
+
+    def query(self, vector: List[float], top_k: int) -> List[Dict[str, Any]]:
+        np = self.np
+        with self.lock:
+            self._merge()
+            if self.matrix is None or not self.ids:
+                return []
+
+            q = np.asarray(vector, dtype=np.float32)
+            q = q / (np.linalg.norm(q) or 1.0)
+
+            if self.ivf is not None:
+                centroids, order, offsets = self.ivf
+                nprobe = min(settings.LOCAL_INDEX_NPROBE, len(centroids))
+                lists = np.argpartition(-(centroids @ q), nprobe - 1)[:nprobe]
+                rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists])
+                rows.sort()
+                scores = self.matrix[rows] @ q
+            else:
+                rows = None
+                scores = self.matrix @ q
+
+            k = min(top_k, len(scores))
+            if k <= 0:
+                return []
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+
+            results = []
+            for b in best:
+                row = int(rows[b]) if rows is not None else int(b)
+                results.append({
+                    "id": self.ids[row],
+                    "score": float(scores[b]),
+                    "metadata": self.metadata[row],
+                })
+            return results
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(os.getcwd(), settings.LOCAL_INDEX_DIR)
+        self._namespaces: Dict[str, _LocalNamespace] = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: str) -> _LocalNamespace:
+        if not namespace or not _NAMESPACE_RE.match(namespace):
+            raise ValueError(f"Invalid namespace: {namespace!r}")
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is not None and not ns.staged and not ns.deleted and not ns.dirty and ns.version != ns.disk_version():
+                ns = None  # Rewritten by another process (an ingest worker)
+            if ns is None:
+                ns = _LocalNamespace(os.path.join(self.root, namespace))
+                self._namespaces[namespace] = ns
+            return ns
+
+    def query(self, vector, top_k, namespace):
+        return self._namespace(namespace).query(vector, top_k)
+
+    def upsert(self, vectors, namespace):
+        self._namespace(namespace).upsert(vectors)
+
+    def delete_prefix(self, prefix, namespace):
+        return self._namespace(namespace).delete_prefix(prefix)
+
+    def delete_namespace(self, namespace):
+        self._namespace(namespace)  # validates the name
+        with self._lock:
+            self._namespaces.pop(namespace, None)
+        shutil.rmtree(os.path.join(self.root, namespace), ignore_errors=True)
+
+    def list_namespaces(self):
+        found = set()
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if any(os.path.exists(os.path.join(self.root, name, f)) for f in (CURRENT_FILE, "vectors.npy")):
+                    found.add(name)
+        with self._lock:
+            found |= {name for name, ns in self._namespaces.items() if ns.size}
+        return found
+
+    def flush(self, namespace):
+        self._namespace(namespace).flush()
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+async def aclose_vector_store():
+    """Close the process-wide store's clients, if the store was ever created."""
+    if _store is not None:
+        await _store.aclose()
+
+
+def get_vector_store() -> VectorStore:
+    """Return the process-wide vector store selected by `settings.VECTOR_STORE`."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.VECTOR_STORE == "local":
+                    _store = LocalVectorStore()
+                else:
+                    _store = PineconeVectorStore()
+    return _store
@@ -1,17 +1,18 @@
 from git import Repo
 import os
 import shutil
-from typing import List, Dict, Any
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pinecone import Pinecone
-from app.core.config import settings
+from app.services.embeddings import EmbeddingExecutor
+from app.services.incremental import list_source_files
+from app.services.ingestion import build_lexical_index, run_pipeline
+from app.services.trigram_index import build_index
+from app.services.vector_store import get_vector_store
 
-def ingest_repository(repo_url: str):
+def ingest_repository(repo_url: str, workers: int = None):
     print(f"Starting ingestion for {repo_url}...")
     
     # 1. Clone
     repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
+    repo_id = repo_name.lower().replace(" ", "-").replace("_", "-")
     base_path = os.path.join(os.getcwd(), "repos")
     repo_path = os.path.join(base_path, repo_name)
     
@@ -29,69 +30,37 @@ def ingest_repository(repo_url: str):
         os.makedirs(base_path, exist_ok=True)
         Repo.clone_from(repo_url, repo_path)
     
-    # 2. Walk and Load
-    documents = []
-    print("Reading files...")
-    for root, _, files in os.walk(repo_path):
-        if ".git" in root:
-            continue
-        for file in files:
-            file_path = os.path.join(root, file)
-            # Filter non-text or large files
-            if file.endswith(('.py', '.js', '.ts', '.jsx', '.tsx', '.md', '.txt', '.java', '.c', '.cpp', '.h', '.go', '.rs')):
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                        documents.append({"content": content, "source": file_path, "repo": repo_name})
-                except Exception as e:
-                    print(f"Skipping {file}: {e}")
-    
-    print(f"Found {len(documents)} valid text files.")
+    # 2. Walk
+    print("Listing files...")
+    files = list_source_files(repo_path)
+    print(f"Found {len(files)} valid text files.")
 
-    # 3. Chunk
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = []
-    for doc in documents:
-        splits = splitter.split_text(doc["content"])
-        for i, split in enumerate(splits):
-            chunks.append({
-                "id": f"{repo_name}-{os.path.basename(doc['source'])}-{i}",
-                "text": split,
-                "metadata": {"source": doc["source"], "repo": doc["repo"]}
-            })
-    
-    print(f"Created {len(chunks)} chunks.")
-    
-    # 4. Embed and Upsert
-    print("Generating embeddings...")
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    
-    pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-    index = pc.Index(settings.PINECONE_INDEX)
-    
-    batch_size = 100
-    total_batches = (len(chunks) + batch_size - 1) // batch_size
-    
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i:i+batch_size]
-        texts = [c["text"] for c in batch]
-        ids = [c["id"] for c in batch]
-        metadatas = [c["metadata"] for c in batch] # Update: add text to metadata for retrieval
-        for j, m in enumerate(metadatas):
-            m["text"] = texts[j]
+    grep_stats = build_index(repo_path)
+    print(f"Built search index over {grep_stats['files']} files in {grep_stats['seconds']}s.")
+
+    # 3. Read, chunk, embed and upsert as a stream of batches
+    store = get_vector_store()
+
+    with EmbeddingExecutor(workers=workers) as executor:
+        print(f"Generating embeddings with {executor.workers} worker(s)...")
+        stats = run_pipeline(
+            repo_path, files, repo_name,
+            upsert=lambda vectors: store.upsert(vectors, namespace=repo_id),
+            executor=executor,
+            on_progress=lambda s: print(
+                f"Upserted batch {s['batches']} ({s['chunks']} chunks, "
+                f"{s['files']}/{s['total_files']} files, {s['chunks_per_sec']:.1f} chunks/sec, "
+                f"{s['cache_hit_ratio']:.0%} cache hits)"
+            ),
+        )
+    store.flush(repo_id)
 
-        embeds = embeddings.embed_documents(texts)
-        
-        vectors = []
-        for j in range(len(batch)):
-            vectors.append({
-                "id": ids[j],
-                "values": embeds[j],
-                "metadata": metadatas[j]
-            })
-            
-        index.upsert(vectors=vectors)
-        print(f"Upserted batch {i//batch_size + 1}/{total_batches}")
+    bm25_stats = build_lexical_index(repo_id, repo_path, repo_name)
+    print(f"Built BM25 index over {bm25_stats['chunks']} chunks in {bm25_stats['seconds']}s.")
+    print(
+        f"Created {stats['chunks']} chunks ({stats['chunks_per_sec']:.1f} chunks/sec, "
+        f"{stats['cache_hit_ratio']:.0%} served from the embedding cache)."
+    )
 
 if __name__ == "__main__":
     import sys
@@ -99,4 +68,5 @@ if __name__ == "__main__":
         repo = sys.argv[1]
     else:
         repo = "https://github.com/kruth-s/object-identity-ai-gcp"
-    ingest_repository(repo)
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    ingest_repository(repo, workers=workers)
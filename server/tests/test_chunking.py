@@ -0,0 +1,45 @@
+from app.services.chunking import chunk_file
+
+
+def _starts(chunks):
+    return {c["text"].splitlines()[0]: c["start_line"] for c in chunks}
+
+
+def test_python_line_numbers_ignore_non_newline_separators():
+    text = 'x = "a\x0cb"\ny = "\u2028"\n\n\ndef foo():\n    return 1\n\n\ndef bar():\n    return 2\n'
+    chunks = chunk_file("a.py", text, max_chars=40)
+    starts = _starts(chunks)
+    assert starts["def foo():"] == 5
+    assert starts["def bar():"] == 9
+
+
+def test_crlf_line_endings():
+    text = "def foo():\r\n    return 1\r\n\r\n\r\ndef bar():\r\n    return 2\r\n"
+    chunks = chunk_file("a.py", text, max_chars=30)
+    assert [(c["start_line"], c["end_line"]) for c in chunks] == [(1, 4), (5, 6)]
+
+
+RUST = """struct Parser<'a> {
+    src: &'a str,
+}
+
+impl<'a> Parser<'a> {
+    fn open(&self) -> char { '{' }
+    fn quote(&self) -> char { '\\'' }
+}
+
+fn main() {
+    'outer: loop { break 'outer; }
+}
+"""
+
+
+def test_rust_lifetimes_do_not_hide_braces():
+    chunks = chunk_file("lib.rs", RUST, max_chars=100)
+    assert [(c["start_line"], c["end_line"]) for c in chunks] == [(1, 3), (4, 8), (9, 12)]
+
+
+def test_js_single_quoted_strings_still_skip_braces():
+    text = "const open = 'it {';\n\nfunction f() {\n  return 1;\n}\n"
+    chunks = chunk_file("a.js", text, max_chars=40)
+    assert [(c["start_line"], c["end_line"]) for c in chunks] == [(1, 1), (2, 5)]
@@ -0,0 +1,66 @@
+import pytest
+
+from app.services.code_search import required_literal, search_files
+from app.services.trigram_index import build_index
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "a.py").write_text("foo = 1\nfoo = 2\nfoo = 3\n")
+    (tmp_path / "b.py").write_text("foo = 4\n")
+    return str(tmp_path)
+
+
+def test_pages_cover_every_match_once(repo):
+    seen, cursor = [], None
+    while True:
+        page = search_files(repo, ["foo"], limit=2, cursor=cursor)
+        seen += [(m["file"], m["line"]) for m in page["matches"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [("a.py", 1), ("a.py", 2), ("a.py", 3), ("b.py", 1)]
+
+
+def test_max_per_file(repo):
+    result = search_files(repo, ["foo"], max_per_file=1)
+    assert [(m["file"], m["line"]) for m in result["matches"]] == [("a.py", 1), ("b.py", 1)]
+
+
+@pytest.mark.parametrize("kwargs", [{"limit": 0}, {"limit": -1}, {"max_per_file": 0}])
+def test_rejects_limits_below_one(repo, kwargs):
+    with pytest.raises(ValueError):
+        search_files(repo, ["foo"], **kwargs)
+
+
+@pytest.mark.parametrize("pattern, literal", [
+    (r"def\s+main", "main"),
+    (r"foo\.bar", "foo.bar"),
+    (r"\x41bcdef", "bcdef"),
+    (r"\u0041bcdef", "bcdef"),
+    (r"\U00000041bcdef", "bcdef"),
+    (r"\N{LATIN CAPITAL LETTER A}bcdef", "bcdef"),
+    (r"\101bcdef", "bcdef"),
+    (r"\0123abcd", "3abcd"),
+    (r"(foo)\1barz", "barz"),
+    (r"\x4", ""),
+])
+def test_required_literal_skips_whole_escapes(pattern, literal):
+    assert required_literal(pattern) == literal
+
+
+@pytest.mark.parametrize("pattern", [r"\x41bc", r"\u0041bc", r"\U00000041bc", r"\N{LATIN CAPITAL LETTER A}bc", r"\101bc"])
+def test_escaped_patterns_find_their_matches(tmp_path, pattern):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.txt").write_text("xx Abc xx\n")
+    (repo / "b.txt").write_text("41bc 01bc\n")
+    build_index(str(repo))  # The trigram prefilter must not drop a.txt
+    result = search_files(str(repo), [pattern], regex=True)
+    assert [m["file"] for m in result["matches"]] == ["a.txt"]
+
+
+def test_backreference_pattern_finds_its_matches(tmp_path):
+    (tmp_path / "a.txt").write_text("abab\n")
+    result = search_files(str(tmp_path), [r"(ab)\1"], regex=True)
+    assert [m["line"] for m in result["matches"]] == [1]
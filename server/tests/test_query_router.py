@@ -0,0 +1,39 @@
+import pytest
+
+from app.core.config import settings
+from app.services.query_router import needs_plan
+
+
+@pytest.fixture(autouse=True)
+def auto_planner(monkeypatch):
+    monkeypatch.setattr(settings, "PLANNER_MODE", "auto")
+
+
+@pytest.mark.parametrize("query", [
+    "walk me through the ingest pipeline",
+    "compare the local and pinecone vector stores",
+    "how does the router interact with the planner?",
+    "trace a request end-to-end",
+    "where is the queue created and then how is a job claimed",
+    "what is BM25 vs. dense retrieval",
+])
+def test_multi_step_questions_need_plan(query):
+    assert needs_plan(query)
+
+
+@pytest.mark.parametrize("query", [
+    "where is the workflow config?",
+    "what does this traceback mean?",
+    "what happens then?",
+    "where is get_vector_store defined?",
+    "what does parse_verdict return?",
+])
+def test_single_lookups_skip_plan(query):
+    assert not needs_plan(query)
+
+
+def test_planner_mode_overrides(monkeypatch):
+    monkeypatch.setattr(settings, "PLANNER_MODE", "never")
+    assert not needs_plan("walk me through the ingest pipeline")
+    monkeypatch.setattr(settings, "PLANNER_MODE", "always")
+    assert needs_plan("where is the workflow config?")
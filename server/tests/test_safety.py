@@ -0,0 +1,35 @@
+import pytest
+
+from app.services.safety import parse_verdict
+
+
+@pytest.mark.parametrize("review", [
+    "FLAGGED: cites a function that does not exist",
+    "**FLAGGED**\nThe answer invents an API.",
+    "Verdict: FLAGGED",
+    '"FLAGGED"',
+    "_Flagged_ - not grounded",
+    "UNSAFE",
+    "\n\nNot safe: runs rm -rf /",
+])
+def test_flagged_replies(review):
+    assert parse_verdict(review) == "flagged"
+
+
+@pytest.mark.parametrize("review", [
+    "SAFE",
+    "**SAFE** - grounded in the retrieved code",
+    "Verdict: safe.",
+])
+def test_safe_replies(review):
+    assert parse_verdict(review) == "safe"
+
+
+@pytest.mark.parametrize("review", [
+    "",
+    None,
+    "I cannot tell from the context.",
+    "The answer looks fine.\nSAFE",
+])
+def test_replies_without_a_verdict_fail_closed(review):
+    assert parse_verdict(review) == "flagged"